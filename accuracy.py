@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from schema import epoch_hours
+
+
+# Predicted and actual amounts joined on the hour (hours since the epoch, the
+# integer form of (my_date, my_hour)), with the error sums over the trailing
+# `window` hours kept up to date as pairs are added or revised. The newest
+# usage hour may still be accumulating, so it's only joined once a later hour
+# arrives. Each sync joins the usage rows from the last actual hour already
+# joined onwards; after a full reload of either table the whole overlap of the
+# two frames is joined again.
+class ForecastAccuracy:
+
+    def __init__(self, window=24 * 7):
+        self.window = window
+        self.pairs = OrderedDict()
+        self.sums = {"n": 0, "abs": 0.0, "err": 0.0, "pct_n": 0, "pct": 0.0}
+        self.last_hour = None
+        self.generations = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _terms(actual, predicted):
+        err = predicted - actual
+        pct = abs(err) / actual if actual > 0 else None
+        return err, pct
+
+    def _add(self, actual, predicted, sign):
+        err, pct = self._terms(actual, predicted)
+        sums = self.sums
+        sums["n"] += sign
+        sums["abs"] += sign * abs(err)
+        sums["err"] += sign * err
+        if pct is not None:
+            sums["pct_n"] += sign
+            sums["pct"] += sign * pct
+
+    def _upsert(self, hour, actual, predicted):
+        old = self.pairs.get(hour)
+        if old is not None:
+            self._add(*old, -1)
+        self.pairs[hour] = (actual, predicted)
+        self._add(actual, predicted, 1)
+
+    def _expire(self):
+        if self.last_hour is None:
+            return
+        start = self.last_hour - self.window + 1
+        while self.pairs:
+            hour, pair = next(iter(self.pairs.items()))
+            if hour >= start:
+                break
+            del self.pairs[hour]
+            self._add(*pair, -1)
+
+    # Join the usage rows at positions `rows` onto the prediction frame
+    def _join(self, usage, prediction, rows):
+        usage_hours = epoch_hours(usage)[rows]
+        prediction_hours = epoch_hours(prediction)
+        positions = np.searchsorted(prediction_hours, usage_hours)
+        positions = np.minimum(positions, len(prediction_hours) - 1)
+        matched = prediction_hours[positions] == usage_hours
+
+        actual = usage["sum_of_amount"].to_numpy(dtype=np.float64)[rows][matched]
+        predicted = prediction["sum_of_amount"].to_numpy(dtype=np.float64)[positions[matched]]
+        return usage_hours[matched], actual, predicted
+
+    def sync(self, usage_loader, prediction_loader):
+        usage, usage_generation, _ = usage_loader.snapshot()
+        prediction, prediction_generation, _ = prediction_loader.snapshot()
+        with self._lock:
+            if usage.empty or prediction.empty:
+                return self
+            generations = (usage_generation, prediction_generation)
+            rejoin = generations != self.generations or self.last_hour is None
+            if rejoin:
+                first = 0
+            else:
+                first = int(np.searchsorted(epoch_hours(usage), self.last_hour))
+            self.generations = generations
+
+            hours, actual, predicted = self._join(usage, prediction, slice(first, len(usage) - 1))
+            for hour, a, p in zip(hours.tolist(), actual.tolist(), predicted.tolist()):
+                self._upsert(hour, a, p)
+            # A rejoin can add hours older than the ones held; keep them in order
+            if rejoin:
+                self.pairs = OrderedDict(sorted(self.pairs.items()))
+            if len(hours):
+                self.last_hour = max(int(hours[-1]), self.last_hour or 0)
+            self._expire()
+            return self
+
+    # Rolling MAE, MAPE (%) and bias (predicted - actual) over the window
+    def metrics(self):
+        with self._lock:
+            sums = dict(self.sums)
+        n = sums["n"]
+        return {
+            "hours": n,
+            "mae": sums["abs"] / n if n else None,
+            "mape": 100 * sums["pct"] / sums["pct_n"] if sums["pct_n"] else None,
+            "bias": sums["err"] / n if n else None,
+        }
+
+    # Joined hours of the window as a (my_datetime, actual, predicted, error) frame
+    def to_frame(self):
+        with self._lock:
+            hours = np.fromiter(self.pairs.keys(), dtype=np.int64, count=len(self.pairs))
+            values = np.array(list(self.pairs.values()), dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(hours)
+        return pd.DataFrame({
+            "my_datetime": hours[order].astype("datetime64[h]").astype("datetime64[ns]"),
+            "actual": values[order, 0],
+            "predicted": values[order, 1],
+            "error": values[order, 1] - values[order, 0],
+        })
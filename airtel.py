@@ -1,20 +1,40 @@
+# Start the cold start clock (and the import profiler) before anything heavy
+import startup
+startup.begin()
+import spans
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
+from datetime import date, datetime, timedelta
 import time
-import scipy.interpolate as spi
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler
-import plotly.subplots as sp
+import functools
+import logging
 import mysql.connector
 import os
+import uuid
 from utility import connect_mysql
+from incremental import IncrementalLoader
+from queries import USAGE_TABLE, PREDICTION_TABLE, TableQueries, read_all, read_frame, read_one
+from kpis import SlidingKPIs, kpis_from_rows
+from rollups import BUCKET_LABELS, DailyRollup, days_between, summarize_days
+from hour_grid import GridStore, HourGrid
+from cube import RollupCube
+from anomaly import AnomalyDetector
+from quantiles import WEEKDAYS, QuantileSketches
+from export import EXPORT_FORMATS, export_bytes, iter_chunks
+from schema import memory_report, prepare_hourly
+from snapshot import SnapshotStore
+from figure_cache import FigureCache
+from downsample import downsample_frame
+from figure_payload import compact_figure, log_payload, payload_bytes
+from db_pool import ConnectionPool
+from live_view import LiveSeries
+from forecast import ForecastEngine
+from accuracy import ForecastAccuracy
+from refresher import Refresher
 
 BASE_DIR = os.path.abspath(os.path.dirname("__file__"))
 CRED_DIR = os.path.join(BASE_DIR, "cred")
@@ -24,69 +44,658 @@ LOGO_DIR = os.path.join(BASE_DIR, "logo")
 image_file = "airtel_logo.png"
 image_path = os.path.join(LOGO_DIR, image_file)
 
+logger = logging.getLogger("airtel")
 
+# Local Arrow snapshots of the fetched tables, for fast restarts and offline use
+SNAPSHOT_DIR = os.environ.get("AIRTEL_SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshots"))
+
+# Connection pool settings (shared by every session in this process)
+DB_POOL_SIZE = int(os.environ.get("AIRTEL_DB_POOL_SIZE", 5))
+DB_POOL_TIMEOUT = float(os.environ.get("AIRTEL_DB_POOL_TIMEOUT", 30))
+
+# Days of data kept in memory: enough for the 30 day KPIs and the live forecast
+USAGE_WINDOW_DAYS = 35
+PREDICTION_WINDOW_DAYS = 5
+
+# "sql" lets MySQL aggregate the sidebar KPIs; "pandas" keeps them in a sliding window
+KPI_MODE = os.environ.get("AIRTEL_KPI_MODE", "pandas")
+
+# Built figures are cached across reruns and sessions, up to this many MB
+FIGURE_CACHE_MB = float(os.environ.get("AIRTEL_FIGURE_CACHE_MB", 64))
+
+# Hourly charts longer than this many points are downsampled ("lttb" or
+# "minmax" bucketing; both keep the highest and lowest hour). The Daily Usage
+# chart only plots hours for ranges under AIRTEL_MIN_CHART_BARS days (at most
+# 24 * (MIN_CHART_BARS - 1) points), so with the defaults below it never
+# downsamples; this only matters when AIRTEL_MIN_CHART_BARS is raised past
+# about MAX_CHART_POINTS / 24.
+MAX_CHART_POINTS = int(os.environ.get("AIRTEL_MAX_CHART_POINTS", 1000))
+DOWNSAMPLE_METHOD = os.environ.get("AIRTEL_DOWNSAMPLE_METHOD", "lttb")
+
+# The Daily Usage chart shows the coarsest resolution (month, week, day, hour)
+# that still gives it at least this many bars
+MIN_CHART_BARS = int(os.environ.get("AIRTEL_MIN_CHART_BARS", 30))
+
+# Anomaly detection: an hour is flagged when it's more than AIRTEL_ANOMALY_Z
+# standard deviations from the EWMA baseline of its hour of day; baselines
+# are warmed up on this many days of history at startup
+ANOMALY_Z = float(os.environ.get("AIRTEL_ANOMALY_Z", 3.0))
+ANOMALY_ALPHA = float(os.environ.get("AIRTEL_ANOMALY_ALPHA", 0.1))
+ANOMALY_HISTORY_DAYS = int(os.environ.get("AIRTEL_ANOMALY_HISTORY_DAYS", 365))
+
+# Per weekday/hour quantile sketches of usage, saved next to the snapshots and
+# warmed up on this many days of history when there's no saved copy
+QUANTILES_PATH = os.path.join(SNAPSHOT_DIR, "hourly_quantiles.npz")
+QUANTILE_HISTORY_DAYS = int(os.environ.get("AIRTEL_QUANTILE_HISTORY_DAYS", 365))
+
+# Exports are streamed from MySQL in chunks of this many rows
+EXPORT_CHUNK_ROWS = int(os.environ.get("AIRTEL_EXPORT_CHUNK_ROWS", 10000))
+EXPORT_DATASETS = ["Usage", "Prediction", "Usage vs Prediction"]
+
+# Send figures as typed arrays on a real date axis with WebGL line traces;
+# AIRTEL_COMPACT_FIGURES=0 sends them as built
+COMPACT_FIGURES = os.environ.get("AIRTEL_COMPACT_FIGURES", "1") not in ("", "0")
+
+# One background thread refreshes the tables this often (seconds) for every
+# session; 0 turns it off and each rerun refreshes (coalesced) instead
+REFRESH_SECONDS = float(os.environ.get("AIRTEL_REFRESH_SECONDS", 60))
+
+# The Live Forecast chart refreshes itself this often (seconds); 0 turns it off
+LIVE_REFRESH_SECONDS = float(os.environ.get("AIRTEL_LIVE_REFRESH_SECONDS", 60))
+
+# Where the Forecast trace comes from: "table" (the batch job's prediction
+# table) or "model" (fitted in-process on the usage rows)
+FORECAST_SOURCE = os.environ.get("AIRTEL_FORECAST_SOURCE", "table")
+
+# Hours of prediction-vs-actual history the accuracy metrics cover
+ACCURACY_WINDOW_HOURS = int(os.environ.get("AIRTEL_ACCURACY_WINDOW_HOURS", 24 * 7))
+
+# Set AIRTEL_DEBUG=1 to show internal stats in the sidebar
+DEBUG = os.environ.get("AIRTEL_DEBUG", "") not in ("", "0")
+
+
+
+# Process-wide connection pool; physical connections (and the credentials
+# file) are only opened when the pool grows or replaces a stale connection
+@st.cache_resource
+def db_pool():
+    return ConnectionPool(lambda: connect_mysql(CRED_PATH), size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT)
+
+
+# Process-wide loaders that keep already fetched rows and only pull new hours
+@st.cache_resource
+def usage_loader():
+    return IncrementalLoader(USAGE_TABLE, window_days=USAGE_WINDOW_DAYS, prepare=spans.traced("prepare_usage")(prepare_hourly))
+
+
+@st.cache_resource
+def prediction_loader():
+    return IncrementalLoader(PREDICTION_TABLE, window_days=PREDICTION_WINDOW_DAYS, prepare=spans.traced("prepare_prediction")(prepare_hourly))
+
+
+@st.cache_resource
+def snapshot_store():
+    return SnapshotStore(SNAPSHOT_DIR)
+
+
+# Function to bring a loader up to date from the database. After a restart the
+# loader is seeded from its snapshot so only the newer rows are fetched, and
+# while MySQL is unreachable the error is kept on the loader and its rows are
+# served as they are (flagged offline). Runs on the refresher thread, so no
+# Streamlit calls in here.
+def update_table(loader, snapshot_name, pool, store):
+    # Only a cold loader is seeded; a refresh that caught rows landing clears
+    # state too, but its frame is newer than the snapshot
+    if loader.state is None and loader.frame.empty:
+        frame, meta = store.load(snapshot_name)
+        if frame is not None:
+            loader.restore(frame, meta)
 
-# Function to fetch data from the database
-def fetch_table_data_1():
     try:
-        # Connect to the MySQL server
-        myconn = connect_mysql(CRED_PATH)
-
-        query = "SELECT * FROM Airtel_Hour_Wise_Data" 
-        df_actual = pd.read_sql(query, myconn)
-        myconn.close()
-        return df_actual
-    except mysql.connector.Error as err:
-        st.error(f"Error: {err}")
+        # Borrow a connection from the pool
+        with pool.connection() as myconn:
+            df_actual = loader.refresh(myconn)
+        loader.last_error = None
+    except (mysql.connector.Error, TimeoutError) as err:
+        loader.last_error = str(err)
+        return
+
+    # The snapshot is only a cache; a read-only or full disk mustn't stop the page
+    try:
+        store.save_if_changed(snapshot_name, df_actual, loader.snapshot_meta())
+    except OSError as err:
+        logger.warning("Could not save the %s snapshot: %s", snapshot_name, err)
+
+
+# Process-wide data owner: fetches every table on a schedule and coalesces
+# concurrent fetches of the same table into one
+@st.cache_resource
+def refresher():
+    pool, store = db_pool(), snapshot_store()
+    loaders = {"usage": usage_loader(), "prediction": prediction_loader()}
+    worker = Refresher(lambda name: update_table(loaders[name], name, pool, store), loaders, REFRESH_SECONDS)
+    worker.start()
+    return worker
+
+
+# The loader's current rows for this session. With the background refresher
+# running, a session only fetches while the loader has nothing yet; without
+# it, each call refreshes unless the last probe is under max_staleness
+# seconds old. Either way a fetch already in flight is waited on, not
+# repeated. The frame is shared, never modified once published, so app()
+# must only read it (my_date is already a datetime and my_datetime is set,
+# see schema.py).
+def refresh_table(loader, snapshot_name, max_staleness=0):
+    worker = refresher()
+    fresh = loader.state is not None and time.time() - loader.probed_at < max_staleness
+    if loader.frame.empty or not (worker.running or fresh):
+        worker.refresh(snapshot_name)
+
+    if loader.frame.empty:
+        if loader.last_error:
+            st.error(f"Error: {loader.last_error}")
         return pd.DataFrame()
+    return loader.frame
+
+
+# Function to fetch data from the database
+@spans.traced("fetch_usage")
+def fetch_table_data_1():
+    return refresh_table(usage_loader(), "usage")
     
 
 # Function to fetch data from the database
+@spans.traced("fetch_prediction")
 def fetch_table_data_2():
+    return refresh_table(prediction_loader(), "prediction")
+
+# Per-day summary store kept in step with the usage loader
+@st.cache_resource
+def usage_rollup():
+    return DailyRollup()
+
+
+# Function to bring the daily rollup up to date with the fetched usage rows
+@spans.traced("daily_rollup")
+def fetch_daily_rollup():
+    return usage_rollup().sync(usage_loader())
+
+
+# Dense day x hour grid of the usage window
+@st.cache_resource
+def usage_grid():
+    return GridStore()
+
+
+# Function to bring the hour grid up to date with the fetched usage rows
+@spans.traced("hour_grid")
+def fetch_hour_grid():
+    return usage_grid().sync(usage_loader())
+
+
+# Day/week/month totals over the whole usage history
+@st.cache_resource
+def usage_cube():
+    return RollupCube()
+
+
+# Function to seed the cube from MySQL once (daily totals of the whole table)
+# and bring it up to date with the fetched usage rows
+@spans.traced("rollup_cube")
+def fetch_rollup_cube():
+    cube = usage_cube()
+    if not cube.seeded and not usage_loader().last_error:
+        try:
+            with db_pool().connection() as myconn:
+                cube.seed(read_all(myconn, TableQueries(USAGE_TABLE).daily_totals()))
+        except (mysql.connector.Error, TimeoutError) as err:
+            st.error(f"Error: {err}")
+    return cube.sync(usage_loader())
+
+
+# Hourly usage rows from `start` on, straight from MySQL, for warming up
+# state that covers more history than the usage loader keeps
+def read_usage_since(start):
+    with db_pool().connection() as myconn:
+        return prepare_hourly(read_frame(myconn, TableQueries(USAGE_TABLE).since(start)))
+
+
+# Per hour-of-day usage baselines and the hours flagged against them
+@st.cache_resource
+def anomaly_detector():
+    return AnomalyDetector(alpha=ANOMALY_ALPHA, threshold=ANOMALY_Z)
+
+
+# Function to backfill the detector over the recent history once, then score
+# the new hours of the usage loader as they land
+@spans.traced("anomalies")
+def fetch_anomalies():
+    detector = anomaly_detector()
+    if detector.last_hour is None and not usage_loader().last_error:
+        try:
+            detector.sync(read_usage_since(date.today() - timedelta(days=ANOMALY_HISTORY_DAYS)))
+        except (mysql.connector.Error, TimeoutError) as err:
+            st.error(f"Error: {err}")
+    return detector.sync(usage_loader().frame)
+
+
+# Per weekday/hour usage quantile sketches, restored from disk if saved before
+@st.cache_resource
+def usage_quantiles():
+    sketches = QuantileSketches()
+    sketches.load(QUANTILES_PATH)
+    return sketches
+
+
+# Function to add the hours the sketches haven't seen yet: from MySQL when the
+# gap reaches back past the usage loader's window (first run, or a saved copy
+# from long ago), then from the loader. Saved whenever hours were added.
+@spans.traced("quantiles")
+def fetch_quantiles():
+    sketches = usage_quantiles()
+    loader = usage_loader()
+    frame = loader.frame
+    if not frame.empty and not loader.last_error:
+        last_hour = pd.Timestamp(np.datetime64(sketches.last_hour, 'h')) if sketches.last_hour is not None else None
+        if last_hour is None or last_hour < frame['my_datetime'].iat[0]:
+            start = last_hour.date() if last_hour is not None else date.today() - timedelta(days=QUANTILE_HISTORY_DAYS)
+            try:
+                sketches.sync(read_usage_since(start))
+            except (mysql.connector.Error, TimeoutError) as err:
+                st.error(f"Error: {err}")
+    if sketches.sync(frame):
+        try:
+            sketches.save(QUANTILES_PATH)
+        except OSError as err:
+            st.warning(f"Could not save the usage quantiles ({err}).")
+    return sketches
+
+
+# Sliding 30 day KPI window fed from the usage loader
+@st.cache_resource
+def usage_kpis():
+    return SlidingKPIs()
+
+
+# Function to read the sidebar KPIs off the sliding window
+@spans.traced("kpis_sliding")
+def fetch_sliding_kpis(start):
+    engine = usage_kpis()
+    engine.sync(usage_loader())
+    return engine.kpis(start)
+
+
+@st.cache_data(ttl=3600)
+def _query_date_bounds():
+    with db_pool().connection() as myconn:
+        return read_one(myconn, TableQueries(USAGE_TABLE).date_bounds())
+
+
+@st.cache_resource
+def figure_cache():
+    return FigureCache(max_bytes=int(FIGURE_CACHE_MB * 1024 * 1024))
+
+
+# Function to fetch the first and last date of the usage table; (None, None)
+# when offline so the picker falls back to the rows in memory
+def fetch_date_bounds():
+    if usage_loader().last_error:
+        return (None, None)
+    try:
+        return _query_date_bounds()
+    except (mysql.connector.Error, TimeoutError):
+        return (None, None)
+
+
+# Build (or reuse) a cached figure, compacted for the browser unless disabled
+def cached_figure(key, build):
+    build = spans.traced(f"figure_build:{key[0]}")(build)
+    if COMPACT_FIGURES:
+        return figure_cache().get_or_build(key, lambda: compact_figure(build()))
+    return figure_cache().get_or_build(key, build)
+
+
+# st.plotly_chart that logs the serialized size of each section's figure
+def plot_figure(section, figure, **kwargs):
+    size = figure_cache().size_of(figure)
+    if size is None:
+        size = payload_bytes(figure)
+    log_payload(section, size, COMPACT_FIGURES)
+    st.session_state.setdefault("figure_payloads", {})[section] = size
+    with spans.span(f"plotly_chart:{section}"):
+        st.plotly_chart(figure, **kwargs)
+
+
+# Overlay flagged hours (AnomalyDetector frames) on a chart as markers
+def add_anomaly_markers(figure, flagged):
+    if flagged.empty:
+        return
+    figure.add_trace(go.Scatter(
+        x=flagged['my_datetime'],
+        y=flagged['sum_of_amount'],
+        customdata=np.column_stack([flagged['expected'], flagged['z']]),
+        mode='markers',
+        name='Anomaly',
+        marker=dict(symbol='x', size=9, color='black'),
+        hovertemplate='<b>Anomaly:</b> %{x|%Y-%m-%d %H}<br><b>Amount:</b> %{y:.3s}<br><b>Expected:</b> %{customdata[0]:.3s}<br><b>z:</b> %{customdata[1]:.1f}<extra></extra>',
+    ))
+
+
+# Query for an export of one dataset over the selected range
+def export_query(dataset, start_date, end_date):
+    usage, prediction = TableQueries(USAGE_TABLE), TableQueries(PREDICTION_TABLE)
+    if dataset == "Prediction":
+        return prediction.date_range(start_date, end_date)
+    if dataset == "Usage vs Prediction":
+        return usage.joined_range(prediction, start_date, end_date)
+    return usage.date_range(start_date, end_date)
+
+
+# Export controls for the selected range. The file is only built when asked
+# for, streamed from MySQL chunk by chunk into a temporary file. The prepared
+# file is kept in the session (one per section) until it's downloaded or the
+# selection changes, so an auto-refreshing fragment doesn't drop the button.
+def export_controls(section, start_date, end_date):
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dataset = st.selectbox("Export data", EXPORT_DATASETS, key=f"{section}_export_dataset")
+    with col2:
+        fmt = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key=f"{section}_export_format")
+    with col3:
+        exports = st.session_state.setdefault("exports", {})
+        selection = (dataset, fmt, start_date, end_date)
+        if st.button("Prepare export", key=f"{section}_export_prepare"):
+            try:
+                with spans.span(f"export:{section}"), db_pool().connection() as myconn:
+                    query = export_query(dataset, start_date.date(), end_date.date())
+                    exports[section] = (selection, export_bytes(iter_chunks(myconn, query, EXPORT_CHUNK_ROWS), fmt))
+            except (mysql.connector.Error, TimeoutError) as err:
+                st.error(f"Error: {err}")
+                return
+
+        prepared = exports.get(section)
+        if prepared is None or prepared[0] != selection:
+            exports.pop(section, None)
+            return
+
+        suffix, mime = EXPORT_FORMATS[fmt]
+        file_name = f"airtel_{dataset.lower().replace(' ', '_')}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{suffix}"
+        st.download_button(
+            f"Download {dataset} ({fmt})", prepared[1], file_name=file_name, mime=mime,
+            key=f"{section}_export_download", on_click=exports.pop, args=(section, None),
+        )
+
+
+@st.cache_data(ttl=600, max_entries=16)
+def _query_usage_range(start_date, end_date):
+    with db_pool().connection() as myconn:
+        return read_frame(myconn, TableQueries(USAGE_TABLE).date_range(start_date, end_date))
+
+
+# Function to fetch the usage rows of a date range from the database. Errors
+# are caught outside the cache so a failed query is retried on the next rerun.
+def fetch_usage_range(start_date, end_date):
     try:
-        # Connect to the MySQL server
-        myconn = connect_mysql(CRED_PATH)
-
-        query = '''SELECT
-                    *
-                FROM
-                    vr.airtel_daily_prediction
-                ORDER BY
-                    my_date ASC,
-                    my_hour ASC;
-                '''
-        df_actual = pd.read_sql(query, myconn)
-        myconn.close()
-        return df_actual
-    except mysql.connector.Error as err:
+        return _query_usage_range(start_date, end_date)
+    except (mysql.connector.Error, TimeoutError) as err:
         st.error(f"Error: {err}")
-        return pd.DataFrame()
+        return pd.DataFrame(columns=["my_date", "my_hour", "sum_of_amount"])
+
+
+# Function to aggregate the sidebar KPIs in the database (None on failure)
+@spans.traced("kpis_sql")
+def fetch_kpi_summary(start):
+    try:
+        with db_pool().connection() as myconn:
+            return kpis_from_rows(read_all(myconn, TableQueries(USAGE_TABLE).kpi_summary(start)))
+    except (mysql.connector.Error, TimeoutError) as err:
+        st.error(f"Error: {err}")
+        return None
+
+
+# Use the in-memory grid when it covers the selected range, otherwise query
+# just that range and grid it
+@spans.traced("range_filter")
+def select_range_grid(df_Grid, start_date, end_date):
+    if df_Grid.covers(start_date):
+        return df_Grid
+    return HourGrid.from_frame(fetch_usage_range(start_date.date(), end_date.date()))
+
+
+# Same for the per-day rollup; ranges outside the window are summarised on the spot
+@spans.traced("daily_range")
+def select_daily_range(df_Grid, df_Daily, filtered_data, start_date, end_date):
+    if df_Grid.covers(start_date):
+        return days_between(df_Daily, start_date, end_date)
+    return summarize_days(filtered_data)
 
    
+# Process-wide forecasting model, refitted when a new usage hour lands
+@st.cache_resource
+def forecast_engine():
+    return ForecastEngine()
+
+
+# Next 24 hours forecast from the usage rows, or None if it can't be made
+@spans.traced("forecast_model")
+def fetch_model_forecast():
+    try:
+        return forecast_engine().sync(usage_loader())
+    except ImportError as err:
+        st.warning(f"In-process forecast unavailable ({err}); showing the prediction table.")
+        return None
+
+
+# Start the trace of this script run, numbering the session's reruns
+def begin_trace(kind):
+    if not spans.ENABLED:
+        return None
+    state = st.session_state
+    if "trace_session" not in state:
+        state["trace_session"] = uuid.uuid4().hex[:12]
+    state["trace_rerun"] = state.get("trace_rerun", 0) + 1
+    return spans.begin(state["trace_session"], state["trace_rerun"], kind)
+
+
+# Prediction table joined with the actuals as they arrive
+@st.cache_resource
+def forecast_accuracy():
+    return ForecastAccuracy(window=ACCURACY_WINDOW_HOURS)
+
+
+# Live Forecast chart points for this session
+def live_series():
+    if "live_series" not in st.session_state:
+        st.session_state["live_series"] = {
+            "usage": LiveSeries(24 * 3),        # last 3 days
+            "prediction": LiveSeries(24 * 4),   # last 4 days
+            "forecast": LiveSeries(24),         # today
+        }
+    return st.session_state["live_series"]
+
+
+## Merging usage bar chart with forecast (last 1 day) and prediction (last 4 days) graphs ##
+
+# Reruns on its own every LIVE_REFRESH_SECONDS without rerunning the rest of
+# the page: the loaders fetch only the hours after their watermark and the
+# chart points are extended with just those hours
+@st.fragment(run_every=LIVE_REFRESH_SECONDS or None)
+def live_forecast_section(start_date, end_date):
+    # The fragment's own reruns get their own trace; in a full run it's part of app()'s
+    own_trace = spans.ENABLED and spans.current() is None
+    if own_trace:
+        begin_trace("fragment")
+    try:
+        with spans.span("live_forecast"):
+            render_live_forecast(start_date, end_date)
+    finally:
+        if own_trace:
+            spans.end()
+
+
+# Live Forecast chart plus the forecast accuracy strip and chart
+def render_live_forecast(start_date, end_date):
+    # Without the background refresher, a full page run has only just
+    # refreshed the loaders, so don't probe twice
+    usage = refresh_table(usage_loader(), "usage", max_staleness=LIVE_REFRESH_SECONDS / 2)
+    prediction = refresh_table(prediction_loader(), "prediction", max_staleness=LIVE_REFRESH_SECONDS / 2)
+    if usage.empty or prediction.empty:
+        return
+
+    series = live_series()
+    anomalies = fetch_anomalies()
+    series["usage"].extend(usage, usage_loader().generation)
+    series["prediction"].extend(prediction, prediction_loader().generation)
+
+    forecast, forecast_key = prediction, prediction_loader().generation
+    if FORECAST_SOURCE == "model":
+        model_forecast = fetch_model_forecast()
+        if model_forecast is not None:
+            forecast, forecast_key = model_forecast, ("model", model_forecast.attrs["version"])
+    series["forecast"].extend(forecast, forecast_key)
+    forecast_name = 'Forecast Graph (Next 24 Hours)' if forecast is not prediction else 'Forecast Graph (For Today)'
+
+    # Dropdown to select between 'Usage', 'Prediction', 'Forecast', or 'All'
+    selected_chart = st.selectbox("", key="live_chart", options=['Usage + Prediction + Forecast Graph', 'Usage Graph', 'Prediction Graph', 'Forecast Graph'])
+
+    # Build only the traces the selected view shows
+    def build_selected_fig():
+        show_all = selected_chart == 'Usage + Prediction + Forecast Graph'
+        selected_fig = go.Figure()
+
+        # Add traces for the usage bar chart
+        if show_all or selected_chart == 'Usage Graph':
+            selected_fig.add_trace(go.Bar(
+                x=series['usage'].x,
+                y=series['usage'].y,
+                name='Usage Graph (Last 3 Days)',
+                marker_color='#ba181b',
+                showlegend=True
+            ))
+
+        # Mark the anomalous usage hours
+        if show_all or selected_chart == 'Usage Graph':
+            if series['usage'].x.size:
+                add_anomaly_markers(selected_fig, anomalies.between(series['usage'].x[0], series['usage'].x[-1]))
+
+        # Add traces for the prediction line chart
+        if show_all or selected_chart == 'Prediction Graph':
+            selected_fig.add_trace(go.Scatter(
+                x=series['prediction'].x,
+                y=series['prediction'].y,
+                name='Prediction Graph (Last 4 Days)',
+                marker_color='blue',
+                showlegend=True
+            ))
+
+        # Add traces for the forecast line chart
+        if show_all or selected_chart == 'Forecast Graph':
+            selected_fig.add_trace(go.Scatter(
+                x=series['forecast'].x,
+                y=series['forecast'].y,
+                name=forecast_name,
+                marker_color='green',
+                showlegend=True
+            ))
+
+        selected_fig.update_layout(
+            barmode='group',
+            title=f"Showing : {selected_chart}",
+            xaxis_title="Date and Hour",
+            yaxis_title="Amount",
+            height=350,
+            width=650,
+        )
+        return selected_fig
+
+    data_version = (usage.attrs.get("version"), prediction.attrs.get("version"), forecast_key, anomalies.version)
+    selected_fig = cached_figure(("live", data_version, selected_chart), build_selected_fig)
+
+    plot_figure("live", selected_fig, use_container_width=True)
+
+    # Download the range selected under Daily Usage Analytics
+    export_controls("live", start_date, end_date)
+
+## Forecast accuracy: prediction table vs actual usage ##
+
+    with spans.span("accuracy"):
+        accuracy = forecast_accuracy().sync(usage_loader(), prediction_loader())
+    metrics = accuracy.metrics()
+    if not metrics["hours"]:
+        return
+
+    # KPI strip with the rolling MAE, MAPE and bias
+    strip = [
+        ("Mean Absolute Error", f"৳ {metrics['mae']:,.0f}"),
+        ("Mean Absolute % Error", f"{metrics['mape']:.1f}%" if metrics["mape"] is not None else "n/a"),
+        ("Bias (Predicted - Actual)", f"৳ {metrics['bias']:+,.0f}"),
+    ]
+    for column, (label, value) in zip(st.columns(len(strip)), strip):
+        with column:
+            st.markdown(
+                '<div style="background-color:#c75146; padding:10px; border-radius:5px;">'
+                f'<h7 style="font-size:16px; color:white;">{label} (last {metrics["hours"]} hours)</h7>'
+                '</div>',
+                unsafe_allow_html=True
+            )
+            st.markdown(f'<p style="font-size:24px; ">{value}</p>', unsafe_allow_html=True)
+
+    # Prediction error per hour
+    def build_fig_error():
+        errors = accuracy.to_frame()
+        fig_error = go.Figure(go.Bar(
+            x=errors['my_datetime'],
+            y=errors['error'],
+            marker_color=np.where(errors['error'] >= 0, '#ba181b', 'blue'),
+            hovertemplate='<b>Date and Hour:</b> %{x|%Y-%m-%d %H}<br><b>Predicted - Actual:</b> %{y:.3s}<extra></extra>',
+        ))
+        fig_error.update_layout(
+            title='Prediction Error Over Time',
+            xaxis_title="Date and Hour",
+            yaxis_title="Predicted - Actual",
+            height=300,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig_error
+
+    fig_error = cached_figure(("accuracy", usage.attrs.get("version"), prediction.attrs.get("version")), build_fig_error)
+    plot_figure("accuracy", fig_error, use_container_width=True)
+
+
 def app():
+    begin_trace("rerun")
     df_Usage = fetch_table_data_1()
     df_Prediction = fetch_table_data_2()
    
     if df_Usage.empty or df_Prediction.empty:
         st.error("No data fetched from the database.")
         return
-    
-    # Convert date column to datetime objects
-    df_Usage["my_date"] = pd.to_datetime(df_Usage["my_date"])
-    df_Prediction["my_date"] = pd.to_datetime(df_Prediction["my_date"])
 
-    # Combine 'my_hour' and 'my_date' into a new column 'Date and Hour of the Day'
-    df_Usage['Date and Hour of the Day'] = df_Usage['my_date'].dt.strftime('%Y-%m-%d') + ' ' + df_Usage['my_hour'].astype(str).str.zfill(2)
-    df_Prediction['Date and Hour of the Day'] = df_Prediction['my_date'].dt.strftime('%Y-%m-%d') + ' ' + df_Prediction['my_hour'].astype(str).str.zfill(2)
+    # MySQL is unreachable: say so and carry on with the snapshot
+    offline_error = usage_loader().last_error or prediction_loader().last_error
+    if offline_error:
+        last_hour = df_Usage['my_datetime'].max().strftime('%b %d, %Y %H:00')
+        st.warning(f"Offline view: the database is unreachable ({offline_error}). Showing saved data up to {last_hour}.")
+
+    # Daily totals, peak hours and time-of-day buckets
+    df_Daily = fetch_daily_rollup()
+
+    # Hour-by-day grid for range lookups
+    df_Grid = fetch_hour_grid()
 
-    # Filter data for usage (last 7 days)
-    last_3_days_data = df_Usage.tail(24 * 3)
+    # Day/week/month totals for long ranges
+    df_Cube = fetch_rollup_cube()
 
-    # Filter data for prediction (last 8 days)
-    last_4_days_data = df_Prediction.tail(24 * 4)
+    # Hours flagged as anomalies
+    anomalies = fetch_anomalies()
 
-    # Filter data for the forecast (last 1 day)
-    last_1_day_data = df_Prediction.tail(24)
+    # Usage quantiles per weekday and hour
+    quantiles = fetch_quantiles()
+
+    # Figures are cached on the version of the rows they're built from
+    figures = figure_cache()
+    data_version = (df_Usage.attrs.get("version"), df_Prediction.attrs.get("version"))
 
      
 ## dashboard title ##
@@ -135,7 +744,7 @@ def app():
       st.subheader("Date Range Selection")
 
       # Set a default value for start_date within the allowed range
-      min_date = df_Usage["my_date"].min()
+      min_date = fetch_date_bounds()[0] or df_Usage["my_date"].min()
       max_date = df_Usage["my_date"].max()
       default_start_date = max_date - timedelta(days=7)  # Default to 7 days before the max date
 
@@ -143,12 +752,12 @@ def app():
       # Select the start date
       start_date = st.date_input("Select Start Date", min_value=min_date, max_value=max_date, value=default_start_date)
 
-      # Determine the maximum allowed end date based on the start date and a maximum of 7 days
-      max_allowed_end_date = start_date + timedelta(days=7)
+      # Any range up to the latest date can be picked; long ranges are downsampled for the chart
+      default_end_date = min(start_date + timedelta(days=7), max_date.date())
 
 
       # Select the end date within the allowed range
-      end_date = st.date_input("Select End Date", min_value=start_date, max_value=max_allowed_end_date, value=max_allowed_end_date)
+      end_date = st.date_input("Select End Date", min_value=start_date, max_value=max_date, value=default_end_date)
 
       # Convert start_date and end_date to datetime64[ns]
       start_date = pd.to_datetime(start_date)
@@ -158,55 +767,86 @@ def app():
     
  ## Selected Date Range Visualization ##
     
-    # Filter the data for the selected date range
-    filtered_data = df_Usage[(df_Usage["my_date"] >= start_date) & (df_Usage["my_date"] <= end_date)]
-
-    # Combine 'my_hour' and 'my_date' into a new column 'Date and Hour of the Day'
-    filtered_data['Date and Hour of the Day'] = filtered_data['my_date'].dt.strftime('%Y-%m-%d') + ' ' + filtered_data['my_hour'].astype(str).str.zfill(2)   
+    # Filter the data for the selected date range. Only the charts that need
+    # hours call this, and only when they're rebuilt, so a long range outside
+    # the window is fetched hour by hour only when one of them needs it.
+    @functools.lru_cache(maxsize=None)
+    def range_grid():
+        return select_range_grid(df_Grid, start_date, end_date)
+    range_key = (data_version, start_date, end_date)
  
     
     
 ## Date Range Charts ##
 
-    # Create a constant color for all dates (in this example, using black)
-    filtered_data['color'] = 'black'
+    # Coarsest resolution that still fills the chart
+    resolution = df_Cube.resolution_for(start_date, end_date, MIN_CHART_BARS)
+    x_labels = {
+        'hour': ('Date and Hour', '%{x|%Y-%m-%d %H}', ''),
+        'day': ('Date', '%{x|%Y-%m-%d}', ' (daily totals)'),
+        'week': ('Week Starting', '%{x|%Y-%m-%d}', ' (weekly totals)'),
+        'month': ('Month', '%{x|%b %Y}', ' (monthly totals)'),
+    }
+    x_label, x_format, title_note = x_labels[resolution]
 
     # Create a bar plot with larger size
-    fig_bar = px.bar(
-       filtered_data,
-       x='Date and Hour of the Day',
-       y='sum_of_amount',
-       title='Usage History For Selected Date Range',
-       height=350,
-       width=550,
-       labels={
-          'Date and Hour of the Day': 'Date and Hour', 
-          'sum_of_amount': 'Total Amount'  
-    },
-       
-    )
-    # Update hovertemplate to include custom information
-    fig_bar.update_traces(
-        hovertemplate='<b>Date and Hour:</b> %{x}<br><b>Total Amount:</b> %{y:.3s}<extra></extra>',  
-        marker_color='#ba181b'
-    )
-    
-    # Update the layout to make the background transparent
-    fig_bar.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)'
-    )
+    def build_fig_bar():
+        title = 'Usage History For Selected Date Range' + title_note
+        if resolution == 'hour':
+            filtered_data = range_grid().to_frame(start_date, end_date)
+            plotted_data = downsample_frame(filtered_data, 'my_datetime', 'sum_of_amount', MAX_CHART_POINTS, DOWNSAMPLE_METHOD)
+            if len(plotted_data) < len(filtered_data):
+                title += f' ({len(plotted_data):,} of {len(filtered_data):,} hours shown)'
+        else:
+            plotted_data = df_Cube.between(resolution, start_date, end_date).rename(columns={'period': 'my_datetime'})
+
+        fig_bar = px.bar(
+           plotted_data,
+           x='my_datetime',
+           y='sum_of_amount',
+           title=title,
+           height=350,
+           width=550,
+           labels={
+              'my_datetime': x_label,
+              'sum_of_amount': 'Total Amount'  
+        },
+           
+        )
+        # Update hovertemplate to include custom information
+        fig_bar.update_traces(
+            # The browser formats the hour label, only for the points shown
+            hovertemplate=f'<b>{x_label}:</b> {x_format}<br><b>Total Amount:</b> %{{y:.3s}}<extra></extra>',
+            marker_color='#ba181b'
+        )
+        
+        # Mark the anomalous hours
+        if resolution == 'hour':
+            add_anomaly_markers(fig_bar, anomalies.between(start_date, end_date))
+
+        # Update the layout to make the background transparent
+        fig_bar.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig_bar
+
+    fig_bar = cached_figure(("range_bar", resolution, df_Cube.seeded, anomalies.version) + range_key, build_fig_bar)
 
     with col2:
-      st.plotly_chart(fig_bar, use_container_width=True)
+      plot_figure("range_bar", fig_bar, use_container_width=True)
 
     
     
     
 ## KPIS for Selected date range ##
     
-    # Calculate total usage amount for the selected date range
-    total_usage_selected_range = filtered_data['sum_of_amount'].sum()
+    # Calculate total usage amount for the selected date range (from the
+    # daily totals once the cube holds the whole history)
+    if df_Cube.seeded:
+        total_usage_selected_range = df_Cube.total(start_date, end_date)
+    else:
+        total_usage_selected_range = range_grid().range_total(start_date, end_date)
     # Helper function to format amounts
     def format_amount(amount):
         if amount.is_integer():
@@ -233,6 +873,9 @@ def app():
          unsafe_allow_html=True
     )
      
+    # Download the selected range
+    export_controls("daily", start_date, end_date)
+
     st.markdown("---")
     
     
@@ -244,61 +887,59 @@ def app():
 
 ## bar chart ##
 
-    # Calculate the hour with the highest usage for each day
-    highest_usage_hour_data = filtered_data.groupby(['my_date', 'my_hour']).agg({'sum_of_amount': 'sum'}).reset_index()
-
     # Create a custom bar chart with amounts on top of bars
-    fig_bar_chart = go.Figure()
-    formatted_hours = []
-    max_amounts = []
-
-    for date, data in highest_usage_hour_data.groupby('my_date'):
-        highest_hour = data.loc[data['sum_of_amount'].idxmax(), 'my_hour']
-        am_pm = "AM" if highest_hour < 12 else "PM"
-        formatted_hour = f"{highest_hour % 12} {am_pm}, {date.strftime('%b%d')}"
-        formatted_hours.append(formatted_hour)
-        max_amounts.append(data['sum_of_amount'].max())
-    # Format amounts to remove fractional part
-    formatted_max_amounts = [f"{int(amount):,}" for amount in max_amounts]
-
-    fig_bar_chart.add_trace(go.Bar(
-        x=formatted_hours,
-        y=max_amounts,
-        text=formatted_max_amounts,
-        textposition='inside',
-        textangle=0,
-        insidetextanchor='middle',
-        name=date.strftime('%Y-%m-%d'),
-        hovertemplate='<b>Date and Hour:</b> %{x}<br><b>Amount:</b> %{y:.3s}<extra></extra>',
-        marker_color='#ba181b' 
-    ))
+    def build_fig_bar_chart():
+        range_days = select_daily_range(df_Grid, df_Daily, range_grid().to_frame(start_date, end_date), start_date, end_date)
+
+        fig_bar_chart = go.Figure()
+        formatted_hours = []
+        max_amounts = []
+
+        # The hour with the highest usage for each day comes from the daily rollup
+        for date, day in range_days.iterrows():
+            highest_hour = int(day['peak_hour'])
+            am_pm = "AM" if highest_hour < 12 else "PM"
+            formatted_hour = f"{highest_hour % 12} {am_pm}, {date.strftime('%b%d')}"
+            formatted_hours.append(formatted_hour)
+            max_amounts.append(day['peak_amount'])
+        # Format amounts to remove fractional part
+        formatted_max_amounts = [f"{int(amount):,}" for amount in max_amounts]
+
+        fig_bar_chart.add_trace(go.Bar(
+            x=formatted_hours,
+            y=max_amounts,
+            text=formatted_max_amounts,
+            textposition='inside',
+            textangle=0,
+            insidetextanchor='middle',
+            name=date.strftime('%Y-%m-%d'),
+            hovertemplate='<b>Date and Hour:</b> %{x}<br><b>Amount:</b> %{y:.3s}<extra></extra>',
+            marker_color='#ba181b' 
+        ))
+
+        fig_bar_chart.update_layout(
+            barmode='group',
+            title="Highest Hourly Usage On Each Day",
+            xaxis_title="Date and Hour",
+            yaxis_title="Amount",
+            height=350,
+            width=550,
+        )
+        
+        # Update the layout to make the background transparent
+        fig_bar_chart.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig_bar_chart
 
-    fig_bar_chart.update_layout(
-        barmode='group',
-        title="Highest Hourly Usage On Each Day",
-        xaxis_title="Date and Hour",
-        yaxis_title="Amount",
-        height=350,
-        width=550,
-    )
-    
-    # Update the layout to make the background transparent
-    fig_bar_chart.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)'
-    )
+    fig_bar_chart = cached_figure(("peak_hours",) + range_key, build_fig_bar_chart)
 
 
 ## pie chart ##
 
-    # Create a new column 'Time Interval'
-    filtered_data['Time Interval'] = pd.cut(filtered_data['my_hour'], bins=[0, 5, 11, 17, 23], labels=['Midnight to 6AM', '6AM to 12PM', '12PM to 6PM', '6PM to Midnight'])
-
-    # Group the data by 'Time Interval' and calculate the sum of amounts
-    pie_data = filtered_data.groupby('Time Interval')['sum_of_amount'].sum().reset_index()
-
     # Define the order of time intervals for the pie chart
-    time_interval_order = ['Midnight to 6AM', '6AM to 12PM', '12PM to 6PM', '6PM to Midnight']
+    time_interval_order = BUCKET_LABELS
 
     # Identify the index of the slice you want to pop out (e.g., the first slice)
     popout_slice_indices = [time_interval_order.index('Midnight to 6AM'), time_interval_order.index('6PM to Midnight')]
@@ -315,44 +956,93 @@ def app():
         return f'{amount:,}'
     
     # Create an interactive pie chart with specified category order and different pull values
-    fig_pie = go.Figure(data=[
-        go.Pie(
-            labels=pie_data['Time Interval'],
-            values=pie_data['sum_of_amount'],
-            hole=hole_size,
-            pull=[0 if i in popout_slice_indices else 0.05 for i in range(len(time_interval_order))],
-            hovertemplate='<b>Time Of The Day:</b> %{label}<br><b>Amount:</b> %{customdata}<br><b>Percentage:</b> %{percent:.1%}<extra></extra>',
-            customdata=[format_amount(val) for val in pie_data['sum_of_amount']]
-        )
-    ])
-    
+    def build_fig_pie():
+        # Time of day totals straight from the grid's prefix sums
+        pie_data = pd.DataFrame({
+            'Time Interval': BUCKET_LABELS,
+            'sum_of_amount': range_grid().bucket_totals(start_date, end_date).values,
+        })
+
+        fig_pie = go.Figure(data=[
+            go.Pie(
+                labels=pie_data['Time Interval'],
+                values=pie_data['sum_of_amount'],
+                hole=hole_size,
+                pull=[0 if i in popout_slice_indices else 0.05 for i in range(len(time_interval_order))],
+                hovertemplate='<b>Time Of The Day:</b> %{label}<br><b>Amount:</b> %{customdata}<br><b>Percentage:</b> %{percent:.1%}<extra></extra>',
+                customdata=[format_amount(val) for val in pie_data['sum_of_amount']]
+            )
+        ])
+        
 
-    fig_pie.update_layout(
-        title='Usage Percentage In Different Parts Of The Day',
-        height=400,
-        width=600,
-        showlegend=True,  # Hide legend for clarity
-        legend=dict(
-            font=dict(
-                size=14  
+        fig_pie.update_layout(
+            title='Usage Percentage In Different Parts Of The Day',
+            height=400,
+            width=600,
+            showlegend=True,  # Hide legend for clarity
+            legend=dict(
+                font=dict(
+                    size=14  
+                )
             )
         )
-    )
-    
-    # Update the layout to make the background transparent
-    fig_pie.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)'
-    )
+        
+        # Update the layout to make the background transparent
+        fig_pie.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig_pie
+
+    fig_pie = cached_figure(("time_of_day",) + range_key, build_fig_pie)
     
     
     col3, col4 = st.columns(2)
     with col3:
-       st.plotly_chart(fig_bar_chart, use_container_width=True)
+       plot_figure("peak_hours", fig_bar_chart, use_container_width=True)
 
     with col4:
     #    st.plotly_chart(fig_line_chart, use_container_width=True)
-       st.plotly_chart(fig_pie, use_container_width=True)
+       plot_figure("time_of_day", fig_pie, use_container_width=True)
+
+## Percentile bands ##
+
+    # Typical usage per hour of the day (percentile bands over the history)
+    # against the selected range's average
+    def build_fig_bands():
+        bands = quantiles.hourly_bands([0.05, 0.25, 0.5, 0.75, 0.95])
+        hours = np.arange(24)
+        n_days = max(len(range_grid().between(start_date, end_date)), 1)
+        selected_average = range_grid().hour_totals(start_date, end_date) / n_days
+
+        fig_bands = go.Figure()
+        for upper, lower, name, fillcolor in [(4, 0, 'p5 - p95', 'rgba(186,24,27,0.15)'), (3, 1, 'p25 - p75', 'rgba(186,24,27,0.35)')]:
+            fig_bands.add_trace(go.Scatter(x=hours, y=bands[upper], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig_bands.add_trace(go.Scatter(
+                x=hours, y=bands[lower], fill='tonexty', fillcolor=fillcolor, line=dict(width=0), name=name,
+                customdata=bands[upper],
+                hovertemplate=f'<b>Hour:</b> %{{x}}<br><b>{name}:</b> %{{y:.3s}} - %{{customdata:.3s}}<extra></extra>',
+            ))
+        fig_bands.add_trace(go.Scatter(
+            x=hours, y=bands[2], name='Median', line=dict(color='#6a040f', dash='dot'),
+            hovertemplate='<b>Hour:</b> %{x}<br><b>Median:</b> %{y:.3s}<extra></extra>',
+        ))
+        fig_bands.add_trace(go.Scatter(
+            x=hours, y=selected_average, name='Selected Range Average', line=dict(color='black'),
+            hovertemplate='<b>Hour:</b> %{x}<br><b>Average:</b> %{y:.3s}<extra></extra>',
+        ))
+        fig_bands.update_layout(
+            title='Hourly Usage Percentile Bands',
+            xaxis_title='Hour of the Day',
+            yaxis_title='Amount',
+            height=350,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig_bands
+
+    fig_bands = cached_figure(("percentile_bands", quantiles.last_hour) + range_key, build_fig_bands)
+    plot_figure("percentile_bands", fig_bands, use_container_width=True)
        
     st.markdown("---")  
        
@@ -365,62 +1055,7 @@ def app():
     box_style_total_usage = "background-color: #6a040f; padding: 4px; border-radius: 4px; display: inline-block;"
     st.markdown(f"<div style='text-align: center; {box_style_total_usage}'><h4 style='color: white; font-size: 16px;'>Live Forecast Analytics:</h4></div>", unsafe_allow_html=True)
 
-## Merging usage bar chart with forecast (last 1 day) and prediction (last 8 days) graphs ##
-
-    # Create a combined figure
-    fig_combined = go.Figure()
-
-    # Add traces for the usage bar chart
-    fig_combined.add_trace(go.Bar(
-        x=last_3_days_data['Date and Hour of the Day'],
-        y=last_3_days_data['sum_of_amount'],
-        name='Usage Graph (Last 3 Days)',
-        marker_color='#ba181b',
-        showlegend=True
-    ))
-
-    # Add traces for the prediction line chart
-    fig_combined.add_trace(go.Scatter(
-        x=last_4_days_data['Date and Hour of the Day'],
-        y=last_4_days_data['sum_of_amount'],
-        name='Prediction Graph (Last 4 Days)',
-        marker_color='blue',
-        showlegend=True
-    ))
-
-    # Add traces for the forecast line chart
-    fig_combined.add_trace(go.Scatter(
-        x=last_1_day_data['Date and Hour of the Day'],
-        y=last_1_day_data['sum_of_amount'],
-        name='Forecast Graph (For Today)',
-        marker_color='green',
-        showlegend=True
-    ))
-
-    # Dropdown to select between 'Usage', 'Prediction', 'Forecast', or 'All'
-    selected_chart = st.selectbox("", ['Usage + Prediction + Forecast Graph', 'Usage Graph', 'Prediction Graph', 'Forecast Graph'])
-
-    # Initialize selected_fig outside the if statement 
-    selected_fig = go.Figure()
-
-    # Show only the selected chart
-    if selected_chart == 'Usage + Prediction + Forecast Graph':
-        selected_fig = fig_combined
-    else:
-        for trace in fig_combined.data:
-            if trace.name is not None and selected_chart.lower() in trace.name.lower():
-                selected_fig.add_trace(trace)
-
-    selected_fig.update_layout(
-        barmode='group',
-        title=f"Showing : {selected_chart}",
-        xaxis_title="Date and Hour",
-        yaxis_title="Amount",
-        height=350,
-        width=650,
-    )
-
-    st.plotly_chart(selected_fig, use_container_width=True)
+    live_forecast_section(start_date, end_date)
 
 
 
@@ -428,7 +1063,7 @@ def app():
 ## KPIS for last 30 days ##
 
     # Filter data for the last 30 days
-    last_30_days_data = df_Usage[df_Usage["my_date"] >= (datetime.today() - timedelta(days=30))]
+    last_30_days_start = datetime.today() - timedelta(days=30)
     
     # Helper function to format amounts
     def format_amount(amount):
@@ -436,61 +1071,74 @@ def app():
             return f"৳ {amount:,.0f}"
         else:
             return f"৳ {amount:,.2f}"
+
+    # Let MySQL aggregate the KPIs in "sql" mode, otherwise read them off the sliding window
+    kpi = fetch_kpi_summary(last_30_days_start) if KPI_MODE == "sql" else None
+    if kpi is None:
+        kpi = fetch_sliding_kpis(last_30_days_start)
         
-    # Calculate and format total usage in the last 30 days
-    total_usage_last_30_days = last_30_days_data['sum_of_amount'].sum()
-    total_usage_last_30_days_formatted = format_amount(total_usage_last_30_days)
+    # No rows in the last 30 days (e.g. an offline snapshot older than that)
+    if kpi is None:
+        no_data = "No data in the last 30 days"
+        total_usage_last_30_days_formatted = "n/a"
+        highest_usage_day_str = lowest_usage_day_str = highest_usage_hour_str = lowest_usage_hour_str = no_data
+        highest_usage_day_amount_formatted = lowest_usage_day_amount_formatted = "n/a"
+        highest_usage_hour_amount_formatted = lowest_usage_hour_amount_formatted = "n/a"
+    else:
+        # Calculate and format total usage in the last 30 days
+        total_usage_last_30_days = kpi["total"]
+        total_usage_last_30_days_formatted = format_amount(total_usage_last_30_days)
 
 
-    # Highest Usage Day in the last 30 days
-    grouped_data = last_30_days_data.groupby('my_date')['sum_of_amount'].sum()
-    highest_usage_day = grouped_data.idxmax()
-    highest_usage_day_amount = grouped_data.max()
-    highest_usage_day_amount_formatted = format_amount(highest_usage_day_amount)
-    highest_usage_day_str = highest_usage_day.strftime("%B %d, %Y")
-    
-    
-    # Lowest Usage Day in the last 30 days
-    grouped_data = last_30_days_data.groupby('my_date')['sum_of_amount'].sum()
-    lowest_usage_day = grouped_data.idxmin()
-    lowest_usage_day_amount = grouped_data.min()
-    lowest_usage_day_amount_formatted = format_amount(lowest_usage_day_amount)
-    lowest_usage_day_str = lowest_usage_day.strftime("%B %d, %Y")
-    
-    
-    # Highest Usage Hour in the last 30 days
-    grouped_data = last_30_days_data.groupby(['my_date', 'my_hour'])['sum_of_amount'].sum()
-    highest_usage_hour = grouped_data.idxmax()
-    highest_usage_hour_amount = grouped_data.max()
-    highest_usage_hour_amount_formatted = format_amount(highest_usage_hour_amount)
+        # Highest Usage Day in the last 30 days
+        highest_usage_day, highest_usage_day_amount = kpi["highest_day"]
+        highest_usage_day_amount_formatted = format_amount(highest_usage_day_amount)
+        highest_usage_day_str = highest_usage_day.strftime("%B %d, %Y")
 
-    # Determine AM/PM for the highest usage hour
-    am_pm = "AM" if highest_usage_hour[1] < 12 else "PM"
-    formatted_hour = f"{highest_usage_hour[0].strftime('%b %d, %Y')}, {(highest_usage_hour[1] % 12) or 12} {am_pm}"
 
-    # Display the highest usage hour in the desired format
-    highest_usage_hour_str = f"{formatted_hour}"
+        # Lowest Usage Day in the last 30 days
+        lowest_usage_day, lowest_usage_day_amount = kpi["lowest_day"]
+        lowest_usage_day_amount_formatted = format_amount(lowest_usage_day_amount)
+        lowest_usage_day_str = lowest_usage_day.strftime("%B %d, %Y")
 
 
+        # Highest Usage Hour in the last 30 days
+        highest_usage_hour = kpi["highest_hour"][:2]
+        highest_usage_hour_amount = kpi["highest_hour"][2]
+        highest_usage_hour_amount_formatted = format_amount(highest_usage_hour_amount)
 
-    # Lowest Usage Hour in the last 30 days
-    grouped_data = last_30_days_data.groupby(['my_date', 'my_hour'])['sum_of_amount'].sum()
-    lowest_usage_hour = grouped_data.idxmin()
-    lowest_usage_hour_amount = grouped_data.min()
-    lowest_usage_hour_amount_formatted = format_amount(lowest_usage_hour_amount)
+        # Determine AM/PM for the highest usage hour
+        am_pm = "AM" if highest_usage_hour[1] < 12 else "PM"
+        formatted_hour = f"{highest_usage_hour[0].strftime('%b %d, %Y')}, {(highest_usage_hour[1] % 12) or 12} {am_pm}"
+
+        # Display the highest usage hour in the desired format
+        highest_usage_hour_str = f"{formatted_hour}"
+
+        # Where it ranks among the same weekday and hour
+        highest_usage_hour_rank = quantiles.percentile_rank(highest_usage_hour_amount, highest_usage_hour[0].weekday(), highest_usage_hour[1])
+        if highest_usage_hour_rank is not None:
+            highest_usage_hour_str += f"<br>p{highest_usage_hour_rank:.0f} for {WEEKDAYS[highest_usage_hour[0].weekday()]}s at {(highest_usage_hour[1] % 12) or 12} {am_pm}"
+
+
+
+        # Lowest Usage Hour in the last 30 days
+        lowest_usage_hour = kpi["lowest_hour"][:2]
+        lowest_usage_hour_amount = kpi["lowest_hour"][2]
+        lowest_usage_hour_amount_formatted = format_amount(lowest_usage_hour_amount)
+
+        # Determine AM/PM for the lowest usage hour
+        am_pm = "AM" if lowest_usage_hour[1] < 12 else "PM"
+        formatted_hour = f"{lowest_usage_hour[0].strftime('%b %d, %Y')}, {(lowest_usage_hour[1] % 12) or 12} {am_pm}"
+
+        # Display the lowest usage hour in the desired format
+        lowest_usage_hour_str = f"{formatted_hour}" 
+
+        # Where it ranks among the same weekday and hour
+        lowest_usage_hour_rank = quantiles.percentile_rank(lowest_usage_hour_amount, lowest_usage_hour[0].weekday(), lowest_usage_hour[1])
+        if lowest_usage_hour_rank is not None:
+            lowest_usage_hour_str += f"<br>p{lowest_usage_hour_rank:.0f} for {WEEKDAYS[lowest_usage_hour[0].weekday()]}s at {(lowest_usage_hour[1] % 12) or 12} {am_pm}"
 
-    # Determine AM/PM for the lowest usage hour
-    am_pm = "AM" if lowest_usage_hour[1] < 12 else "PM"
-    formatted_hour = f"{lowest_usage_hour[0].strftime('%b %d, %Y')}, {(lowest_usage_hour[1] % 12) or 12} {am_pm}"
 
-    # Display the lowest usage hour in the desired format
-    lowest_usage_hour_str = f"{formatted_hour}" 
-   
-   
-   
-   
-       
-    
     ## Display the KPIS Title
     
     # Define the color and border properties for the box
@@ -584,6 +1232,70 @@ def app():
     </div>
     """, unsafe_allow_html=True)
 
+
+    # Most recent anomalous hours
+    recent_anomalies = anomalies.recent(limit=5)
+    if not recent_anomalies.empty:
+        anomaly_lines = "<br>".join(
+            f"{row.my_datetime.strftime('%b %d, %Y')}, {(row.my_datetime.hour % 12) or 12} {'AM' if row.my_datetime.hour < 12 else 'PM'}: "
+            f"<strong>{format_amount(float(row.sum_of_amount))}</strong> (expected {format_amount(float(round(row.expected)))})"
+            for row in recent_anomalies.itertuples()
+        )
+        st.sidebar.markdown(f"""
+    <div style='{box_style_outer}'>
+        <div style='{box_style_title}'>
+            <h7 style='text-align: center; color: white; font-size: 12px;'><strong>Recent Anomalies:</strong></h7>
+        </div>
+        <p style='text-align: center;'>{anomaly_lines}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Background fetches and how many session requests they absorbed
+    if DEBUG:
+        with st.sidebar.expander("Background refresher"):
+            st.json({"running": refresher().running, **refresher().stats, "refreshed_at": refresher().refreshed_at})
+
+    # Connection pool utilisation and wait time
+    if DEBUG:
+        with st.sidebar.expander("Connection pool"):
+            st.json(db_pool().stats())
+
+    # Bytes per row of the in-memory frames
+    if DEBUG:
+        with st.sidebar.expander("Frame memory"):
+            st.json({"usage": memory_report(df_Usage), "prediction": memory_report(df_Prediction)})
+
+    # Figure cache hits and misses
+    if DEBUG:
+        with st.sidebar.expander("Figure cache"):
+            st.json(figures.stats())
+
+    # Serialized bytes per chart on this page
+    if DEBUG:
+        with st.sidebar.expander("Figure payloads"):
+            payloads = st.session_state.get("figure_payloads", {})
+            st.write(f"Page total: {sum(payloads.values()) / 1024:,.1f} KB")
+            st.json(payloads)
+
+    # Model fits and forecasts
+    if DEBUG and FORECAST_SOURCE == "model":
+        with st.sidebar.expander("Forecast engine"):
+            st.json(forecast_engine().stats)
+
+    # Stage timings of this rerun (also logged as JSON lines)
+    trace = spans.end()
+    if trace is not None:
+        with st.sidebar.expander("Stage timings"):
+            st.write(f"Session {trace.session_id}, rerun {trace.rerun}")
+            st.dataframe(pd.DataFrame(trace.spans, columns=["span", "parent", "depth", "offset_ms", "ms"]))
+
+    # First full render of this process ends the cold start
+    startup.mark_ready()
+    if DEBUG:
+        with st.sidebar.expander("Cold start"):
+            st.write(f"Cold start: {startup.cold_start_seconds():.2f}s")
+            st.json(dict(startup.import_report(limit=15)))
+
     
    
 
@@ -4,15 +4,28 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from csv_ingest import csv_date_bounds, file_signature, read_usage_csv
 
 
-df = pd.read_csv("Airtel_Hour_Wise_Data_202310291658.csv")
+CSV_PATH = "Airtel_Hour_Wise_Data_202310291658.csv"
+
+
+# Parsed results are cached per file version (size + mtime), so an updated
+# export is picked up and an unchanged one is never parsed twice
+@st.cache_data(show_spinner=False)
+def load_csv_bounds(path, signature):
+    return csv_date_bounds(path)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_csv_range(path, signature, start_date, end_date):
+    return read_usage_csv(path, start_date, end_date)
+
 
 # Streamlit app layout
 st.set_page_config(layout="wide")
 
-# Convert date column to datetime objects
-df["my_date"] = pd.to_datetime(df["my_date"])
+csv_signature = file_signature(CSV_PATH)
 
 # # Display the DataFrame in Streamlit
 # st.write("Data from CSV File:")
@@ -48,8 +61,7 @@ with col1:
  st.subheader("Date Range Selection")
 
 # Set a default value for start_date within the allowed range
-min_date = df["my_date"].min()
-max_date = df["my_date"].max()
+min_date, max_date = load_csv_bounds(CSV_PATH, csv_signature)
 default_start_date = max_date - timedelta(days=7)  # Default to 7 days before the max date
 
 with col1:
@@ -67,8 +79,8 @@ with col1:
 start_date = pd.to_datetime(start_date)
 end_date = pd.to_datetime(end_date)
 
-# Filter the data for the selected date range
-filtered_data = df[(df["my_date"] >= start_date) & (df["my_date"] <= end_date)]
+# Read just the selected date range from the CSV
+filtered_data = load_csv_range(CSV_PATH, csv_signature, start_date, end_date)
 
 st.markdown("---")
 
@@ -138,11 +150,6 @@ st.sidebar.subheader(f"৳ {min_daily_usage_formatted}")
 
 
 
-# Combine 'my_hour' and 'my_date' into a new column 'Date and Hour of the Day'
-filtered_data['Date and Hour of the Day'] = filtered_data['my_date'].dt.strftime('%Y-%m-%d') + ' ' + filtered_data['my_hour'].astype(str)
-
-
-
 ### KPIS ###
 # Calculate KPIs for total usage amount in the selected date range
 total_usage = filtered_data['sum_of_amount'].sum()
@@ -273,34 +280,32 @@ with col4:
 # Date Range Charts
 st.subheader("Date Range Charts:")
 
-# Create a constant color for all dates (in this example, using black)
-filtered_data['color'] = 'black'
-
 # Create a bar plot with larger size
 fig_bar = px.bar(
     filtered_data,
-    x='Date and Hour of the Day',
+    x='my_datetime',
     y='sum_of_amount',
-    color='color',
+    color_discrete_sequence=['black'],
     title='Selected Date Range Bar Plot',
     height=350,
     width=550,
+    labels={'my_datetime': 'Date and Hour of the Day'},
 )
 
 
 # Sort the data by date and hour to ensure correct sequence
 filtered_data = filtered_data.sort_values(by=["my_date", "my_hour"])
 
-# Create a line chart where endpoints connect to the starting points of the next date
+# Create a line chart over the real time axis, so days join up end to end
 fig_line = px.line(
     filtered_data,
-    x='Date and Hour of the Day',
+    x='my_datetime',
     y='sum_of_amount',
-    color='color',
+    color_discrete_sequence=['black'],
     title='Selected Date Range Line Plot',
     height=350,
     width=550,
-    category_orders={"my_date": filtered_data["my_date"].unique()}  # Ensure the date sequence is correct
+    labels={'my_datetime': 'Date and Hour of the Day'},
 )
 
 
@@ -0,0 +1,146 @@
+import bisect
+import threading
+
+import numpy as np
+import pandas as pd
+
+from schema import epoch_hours
+
+
+# Flags hours whose amount is far from what that hour of the day usually
+# does. Each hour of the day has its own baseline: an exponentially weighted
+# mean and variance (EWMA) of its past amounts. An hour's z-score is measured
+# against its baseline before the hour itself is folded in, and |z| over
+# `threshold` is an anomaly once the baseline has seen `min_periods` days.
+#
+# update() is O(1) per hour. backfill() runs the same recurrence over a whole
+# history at once, one step per day across all 24 hour-of-day lanes, so years
+# of hours take a few thousand vector operations. The newest hour of a sync
+# may still be accumulating, so it's only scored once a later hour arrives.
+class AnomalyDetector:
+
+    def __init__(self, alpha=0.1, threshold=3.0, min_periods=7):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_periods = min_periods
+        self.mean = np.zeros(24)
+        self.var = np.zeros(24)
+        self.count = np.zeros(24, dtype=np.int64)
+        self.last_hour = None
+        # Flagged hours in time order: (hour, amount, expected, z)
+        self.flags = []
+        # Bumped whenever flags change; key for charts built from them
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def _score(self, lane, amount):
+        if self.count[lane] < self.min_periods or self.var[lane] <= 0:
+            return None
+        return (amount - self.mean[lane]) / np.sqrt(self.var[lane])
+
+    def _fold(self, lane, amount):
+        if self.count[lane] == 0:
+            self.mean[lane] = amount
+        else:
+            diff = amount - self.mean[lane]
+            step = self.alpha * diff
+            self.mean[lane] += step
+            self.var[lane] = (1 - self.alpha) * (self.var[lane] + diff * step)
+        self.count[lane] += 1
+
+    # Score one complete hour and fold it into its baseline
+    def update(self, hour, amount):
+        lane = hour % 24
+        expected = self.mean[lane]
+        z = self._score(lane, amount)
+        self._fold(lane, amount)
+        self.last_hour = hour
+        if z is not None and abs(z) > self.threshold:
+            self.flags.append((hour, amount, float(expected), float(z)))
+            self.version += 1
+        return z
+
+    # Run the detector over hourly amounts starting at first_hour (epoch
+    # hours; NaN for missing hours), continuing from the current state
+    def backfill(self, first_hour, amounts):
+        pad_front = first_hour % 24
+        padded = np.concatenate([np.full(pad_front, np.nan), np.asarray(amounts, dtype=np.float64)])
+        padded = np.concatenate([padded, np.full(-len(padded) % 24, np.nan)])
+        grid = padded.reshape(-1, 24)
+        z = np.full(grid.shape, np.nan)
+        expected = np.full(grid.shape, np.nan)
+
+        mean, var, count = self.mean, self.var, self.count
+        a = self.alpha
+        for day, row in enumerate(grid):
+            seen = ~np.isnan(row)
+            ready = seen & (count >= self.min_periods) & (var > 0)
+            expected[day] = mean
+            z[day, ready] = (row[ready] - mean[ready]) / np.sqrt(var[ready])
+
+            first = seen & (count == 0)
+            mean[first] = row[first]
+            rest = seen & ~first
+            diff = np.where(rest, row - mean, 0.0)
+            step = a * diff
+            mean += step
+            var[rest] = (1 - a) * (var[rest] + diff[rest] * step[rest])
+            count += seen
+
+        base = first_hour - pad_front
+        hours = base + np.arange(grid.size)
+        z, expected = z.ravel(), expected.ravel()
+        hit = np.abs(np.nan_to_num(z)) > self.threshold
+        self.flags.extend(zip(hours[hit].tolist(), padded[hit].tolist(), expected[hit].tolist(), z[hit].tolist()))
+        if hit.any():
+            self.version += 1
+        seen_hours = hours[~np.isnan(padded)]
+        if len(seen_hours):
+            self.last_hour = int(seen_hours[-1])
+        return pd.Series(z[pad_front:pad_front + len(amounts)], index=first_hour + np.arange(len(amounts)))
+
+    # Score the frame's hours after the last one scored, except the newest.
+    # A long gap (e.g. a cold start) is backfilled in one go.
+    def sync(self, frame):
+        if frame.empty:
+            return self
+        with self._lock:
+            hours = epoch_hours(frame)
+            first = 0 if self.last_hour is None else int(np.searchsorted(hours, self.last_hour, side="right"))
+            rows = slice(first, len(hours) - 1)
+            new_hours = hours[rows]
+            amounts = frame["sum_of_amount"].to_numpy(dtype=np.float64)[rows]
+            if len(new_hours) > 48:
+                dense = np.full(new_hours[-1] - new_hours[0] + 1, np.nan)
+                dense[new_hours - new_hours[0]] = amounts
+                self.backfill(int(new_hours[0]), dense)
+            else:
+                for hour, amount in zip(new_hours.tolist(), amounts.tolist()):
+                    self.update(hour, amount)
+            return self
+
+    # Flagged hours with start <= my_date <= end as a
+    # (my_datetime, sum_of_amount, expected, z) frame
+    def between(self, start, end):
+        lo = int(pd.Timestamp(start).to_datetime64().astype("datetime64[h]").astype(np.int64))
+        hi = int((pd.Timestamp(end) + pd.Timedelta(days=1)).to_datetime64().astype("datetime64[h]").astype(np.int64))
+        with self._lock:
+            i, j = bisect.bisect_left(self.flags, (lo,)), bisect.bisect_left(self.flags, (hi,))
+            flags = self.flags[i:j]
+        return self._frame(flags)
+
+    # The `limit` most recent flagged hours, newest first
+    def recent(self, limit=10):
+        with self._lock:
+            flags = self.flags[-limit:][::-1]
+        return self._frame(flags)
+
+    @staticmethod
+    def _frame(flags):
+        hours, amounts, expected, z = (list(column) for column in zip(*flags)) if flags else ([], [], [], [])
+        return pd.DataFrame({
+            "my_datetime": np.array(hours, dtype=np.int64).astype("datetime64[h]").astype("datetime64[ns]"),
+            "sum_of_amount": np.array(amounts, dtype=np.float64),
+            "expected": np.array(expected, dtype=np.float64),
+            "z": np.array(z, dtype=np.float64),
+        })
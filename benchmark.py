@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.express as px
+
+from downsample import downsample_frame
+from figure_payload import compact_figure
+from hour_grid import HourGrid
+from incremental import IncrementalLoader
+from kpis import SlidingKPIs, kpis_from_rows
+from queries import PREDICTION_TABLE, USAGE_TABLE, TableQueries, read_all, read_frame
+from rollups import summarize_days
+from schema import prepare_hourly
+
+
+# Times each stage of the dashboard's data path against synthetic tables of
+# different sizes, with SQLite standing in for MySQL. Results are printed (or
+# written) as JSON so runs on different commits can be compared:
+#
+#   python benchmark.py --months 1 12 60 --repeat 5 --output bench.json
+
+
+# Synthetic hourly amounts: daily and weekly cycles, slow growth and noise.
+# (dates, hours, amounts) for `hours` hours starting at `start`.
+def synthetic_hours(start, hours, seed=0):
+    rng = np.random.default_rng(seed)
+    index = np.arange(hours)
+    hour_of_day = index % 24
+    day_of_week = (index // 24 + start.weekday()) % 7
+    level = 50_000 * (1 + index / (24 * 365) * 0.2)
+    daily = 1 + 0.6 * np.sin(2 * np.pi * (hour_of_day - 6) / 24)
+    weekly = np.where(day_of_week >= 5, 1.15, 1.0)
+    amounts = np.round(level * daily * weekly * rng.lognormal(0, 0.08, hours))
+    dates = [start + timedelta(days=int(d)) for d in index // 24]
+    return dates, hour_of_day, amounts
+
+
+# In-memory SQLite with both tables. The prediction table covers the last 5
+# days of actuals plus the next day, like the batch job writes it.
+def sqlite_standin(months, seed=0):
+    sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+    conn = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.execute("ATTACH DATABASE ':memory:' AS vr")
+
+    hours = int(months * 30.4 * 24) // 24 * 24
+    start = date.today() - timedelta(days=hours // 24)
+    dates, hour_of_day, amounts = synthetic_hours(start, hours, seed)
+    usage = list(zip([d.isoformat() for d in dates], hour_of_day.tolist(), amounts.tolist()))
+
+    pred_dates, pred_hours, pred_amounts = synthetic_hours(start, hours + 24, seed + 1)
+    prediction = list(zip([d.isoformat() for d in pred_dates], pred_hours.tolist(), pred_amounts.tolist()))[-24 * 6:]
+
+    for table, rows in ((USAGE_TABLE, usage), (PREDICTION_TABLE, prediction)):
+        conn.execute(f"CREATE TABLE {table} (my_date DATE, my_hour INTEGER, sum_of_amount REAL)")
+        conn.execute(f"CREATE INDEX {table}_hour ON {table.split('.')[-1]} (my_date, my_hour)")
+        conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?)", rows)
+    conn.commit()
+    return conn, len(usage)
+
+
+# Run `fn` `repeat` times; `setup` (untimed) builds its argument each time
+def timed(fn, repeat, setup=None):
+    runs = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg) if setup is not None else fn()
+        runs.append(time.perf_counter() - start)
+    return {"median_ms": round(1000 * statistics.median(runs), 3), "min_ms": round(1000 * min(runs), 3)}
+
+
+def bench_size(months, repeat, window_days=35, max_points=1000):
+    conn, rows = sqlite_standin(months)
+    usage_queries = TableQueries(USAGE_TABLE, placeholder="?")
+    stages = {}
+
+    # Fetch: the whole table (what app() used to do), the windowed first
+    # load and a one-hour delta
+    stages["fetch_all"] = timed(lambda: read_frame(conn, usage_queries.all()), repeat)
+    stages["fetch_window"] = timed(
+        lambda: IncrementalLoader(USAGE_TABLE, window_days, placeholder="?", prepare=prepare_hourly).refresh(conn),
+        repeat,
+    )
+
+    loader = IncrementalLoader(USAGE_TABLE, window_days, placeholder="?", prepare=prepare_hourly)
+    loader.refresh(conn)
+    next_hour = [pd.Timestamp(loader.frame["my_datetime"].iat[-1])]
+
+    def add_hour():
+        next_hour[0] += pd.Timedelta(hours=1)
+        conn.execute(
+            f"INSERT INTO {USAGE_TABLE} VALUES (?, ?, ?)",
+            (next_hour[0].date().isoformat(), next_hour[0].hour, 50_000.0),
+        )
+        return conn
+
+    stages["fetch_delta"] = timed(loader.refresh, repeat, setup=add_hour)
+
+    # Datetime conversion and labels over the whole table
+    raw = read_frame(conn, usage_queries.all())
+    stages["datetime"] = timed(prepare_hourly, repeat, setup=raw.copy)
+    frame = prepare_hourly(raw.copy())
+    # The per-row string labels app() used to build, for comparison with my_datetime
+    stages["labels_legacy"] = timed(
+        lambda: frame["my_date"].dt.strftime("%Y-%m-%d") + " " + frame["my_hour"].astype(str).str.zfill(2),
+        repeat,
+    )
+
+    # Filtering: grid build and the whole history as the selected range
+    stages["grid_build"] = timed(lambda: HourGrid.from_frame(frame), repeat)
+    grid = HourGrid.from_frame(frame)
+    first_day, last_day = frame["my_date"].iat[0], frame["my_date"].iat[-1]
+    stages["filter_range"] = timed(lambda: grid.to_frame(first_day, last_day), repeat)
+    selected = grid.to_frame(first_day, last_day)
+    stages["downsample"] = timed(
+        lambda: downsample_frame(selected, "my_datetime", "sum_of_amount", max_points), repeat
+    )
+    stages["range_total"] = timed(lambda: grid.range_total(first_day, last_day), repeat)
+
+    # Aggregation: daily rollup, sliding KPIs and the SQL-side KPI query
+    stages["daily_rollup"] = timed(lambda: summarize_days(frame), repeat)
+
+    def sliding_kpis():
+        kpis = SlidingKPIs()
+        kpis.sync(loader)
+        return kpis.kpis(pd.Timestamp(last_day) - pd.Timedelta(days=29))
+
+    stages["kpis_sliding"] = timed(sliding_kpis, repeat)
+    kpi_query = usage_queries.kpi_summary((pd.Timestamp(last_day) - pd.Timedelta(days=29)).date().isoformat())
+    stages["kpis_sql"] = timed(lambda: kpis_from_rows(read_all(conn, kpi_query)), repeat)
+
+    # Figures: build, compact and serialize the selected-range bar chart
+    plotted = downsample_frame(selected, "my_datetime", "sum_of_amount", max_points)
+    stages["figure_build"] = timed(lambda: px.bar(plotted, x="my_datetime", y="sum_of_amount"), repeat)
+    figure = px.bar(plotted, x="my_datetime", y="sum_of_amount")
+    stages["figure_compact"] = timed(lambda: compact_figure(figure), repeat)
+    compact = compact_figure(figure)
+    stages["serialize"] = timed(figure.to_json, repeat)
+    stages["serialize_compact"] = timed(compact.to_json, repeat)
+
+    conn.close()
+    return {
+        "months": months,
+        "rows": rows,
+        "payload_bytes": len(figure.to_json()),
+        "payload_bytes_compact": len(compact.to_json()),
+        "stages": stages,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard's data path on synthetic data")
+    parser.add_argument("--months", type=float, nargs="+", default=[1, 12, 60], help="table sizes in months of hours")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage (the median is reported)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+        "repeat": args.repeat,
+        "sizes": [bench_size(months, args.repeat) for months in args.months],
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+from schema import HOURLY_DTYPES, prepare_hourly
+
+
+# Explicit schema for the hour-wise CSV exports; my_date is parsed by the reader
+CSV_COLUMNS = ["my_date", "my_hour", "sum_of_amount"]
+CSV_DTYPES = {**HOURLY_DTYPES, "sum_of_amount": "float64"}
+CSV_CHUNKSIZE = 100_000
+
+
+# Size and modification time of a file, so cached parses can be keyed on it
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _chunks(path, columns, chunksize):
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if column in columns}
+    return pd.read_csv(
+        path,
+        usecols=columns,
+        dtype=dtypes,
+        parse_dates=["my_date"],
+        chunksize=chunksize,
+    )
+
+
+# First and last my_date in the file, reading only that column chunk by chunk
+def csv_date_bounds(path, chunksize=CSV_CHUNKSIZE):
+    min_date = max_date = None
+    for chunk in _chunks(path, ["my_date"], chunksize):
+        if chunk.empty:
+            continue
+        low, high = chunk["my_date"].min(), chunk["my_date"].max()
+        min_date = low if min_date is None else min(min_date, low)
+        max_date = high if max_date is None else max(max_date, high)
+    return min_date, max_date
+
+
+# Stream the file and keep only rows with start <= my_date <= end, so memory
+# is bounded by the window rather than by the size of the export
+def read_usage_csv(path, start=None, end=None, chunksize=CSV_CHUNKSIZE):
+    kept = []
+    for chunk in _chunks(path, CSV_COLUMNS, chunksize):
+        if start is not None:
+            chunk = chunk[chunk["my_date"] >= start]
+        if end is not None:
+            chunk = chunk[chunk["my_date"] <= end]
+        if not chunk.empty:
+            kept.append(chunk)
+
+    if not kept:
+        frame = pd.DataFrame({column: pd.Series(dtype=CSV_DTYPES.get(column, "datetime64[ns]")) for column in CSV_COLUMNS})
+    else:
+        frame = pd.concat(kept, ignore_index=True)
+    return prepare_hourly(frame)
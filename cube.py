@@ -0,0 +1,185 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from schema import to_day
+
+# Resolutions from finest to coarsest
+RESOLUTIONS = ("hour", "day", "week", "month")
+
+
+# Monday of the ISO week of each day (1970-01-01 was a Thursday)
+def week_start(days):
+    days = np.asarray(days, dtype="datetime64[D]")
+    return days - (days.astype(np.int64) + 3) % 7
+
+
+def month_start(days):
+    return np.asarray(days, dtype="datetime64[D]").astype("datetime64[M]").astype("datetime64[D]")
+
+
+_PERIOD_START = {"week": week_start, "month": month_start}
+
+
+# Usage totals at day, ISO week and month resolution over the whole history
+# (the hourly rows stay with the loader and the hour grid). Daily totals sit
+# in a dense array from first_day with a prefix sum; week and month totals
+# are kept per period start and adjusted by the change of each day written,
+# so landing a new hour touches one day, one week and one month.
+class RollupCube:
+
+    def __init__(self):
+        self.first_day = None
+        self.days = np.zeros(0)
+        self.cum = np.zeros(1)
+        self.periods = {"week": {}, "month": {}}
+        self.seeded = False
+        self.generation = None
+        self.source = None
+        self.last_day = None
+        self._lock = threading.Lock()
+
+    # Load whole-history daily totals: (my_date, amount) rows, e.g. from
+    # TableQueries.daily_totals. Days the loader has already written are
+    # fresher and left alone.
+    def seed(self, rows):
+        if not rows:
+            self.seeded = True
+            return
+        dates = np.array([to_day(row[0]) for row in rows], dtype="datetime64[D]")
+        amounts = np.array([float(row[1]) for row in rows])
+        with self._lock:
+            if self.first_day is not None:
+                keep = dates < self.first_day
+                for day, amount in zip(dates[keep], amounts[keep]):
+                    self._set_day(day, amount)
+            else:
+                self.first_day = dates.min()
+                self.days = np.zeros(int((dates.max() - self.first_day).astype(np.int64)) + 1)
+                np.add.at(self.days, (dates - self.first_day).astype(np.int64), amounts)
+                self.cum = np.concatenate(([0.0], self.days.cumsum()))
+                all_days = self.first_day + np.arange(len(self.days))
+                for resolution, totals in self.periods.items():
+                    starts, index = np.unique(_PERIOD_START[resolution](all_days), return_inverse=True)
+                    totals.update(zip(starts, np.bincount(index, weights=self.days).tolist()))
+            self.seeded = True
+
+    def _set_day(self, day, total):
+        if self.first_day is None:
+            self.first_day = day
+        if day < self.first_day:
+            pad = int((self.first_day - day).astype(np.int64))
+            self.days = np.concatenate([np.zeros(pad), self.days])
+            self.first_day = day
+        i = int((day - self.first_day).astype(np.int64))
+        if i >= len(self.days):
+            self.days = np.concatenate([self.days, np.zeros(i + 1 - len(self.days))])
+
+        delta = total - self.days[i]
+        if delta == 0 and len(self.cum) == len(self.days) + 1:
+            return
+        self.days[i] = total
+        for resolution, totals in self.periods.items():
+            start = _PERIOD_START[resolution](day)[()]
+            totals[start] = totals.get(start, 0.0) + delta
+
+        # Only the prefix sums from this day on move
+        if len(self.cum) != len(self.days) + 1 or i == 0:
+            self.cum = np.concatenate(([0.0], self.days.cumsum()))
+        else:
+            self.cum[i + 1:] = self.cum[i] + self.days[i:].cumsum()
+
+    # Rewrite the days the loader holds from the last day synced onwards (all
+    # of them after a full reload); that day may still have been accumulating
+    def sync(self, loader):
+        frame, generation, _ = loader.snapshot()
+        with self._lock:
+            if frame is self.source or frame.empty:
+                return self
+            dates = frame["my_date"].to_numpy().astype("datetime64[D]")
+            first = 0
+            if generation == self.generation and self.last_day is not None:
+                first = int(np.searchsorted(dates, self.last_day))
+
+            days, index = np.unique(dates[first:], return_inverse=True)
+            totals = np.bincount(index, weights=frame["sum_of_amount"].to_numpy(dtype=np.float64)[first:])
+            for day, total in zip(days, totals):
+                self._set_day(day, float(total))
+
+            self.generation = generation
+            self.source = frame
+            if len(days):
+                self.last_day = days[-1]
+            return self
+
+    # Number of points the range has at `resolution`
+    def count(self, resolution, start, end):
+        start, end = to_day(start), to_day(end)
+        n_days = int((end - start).astype(np.int64)) + 1
+        if resolution == "hour":
+            return 24 * n_days
+        if resolution == "day":
+            return n_days
+        starts = _PERIOD_START[resolution](np.array([start, end]))
+        if resolution == "week":
+            return int((starts[1] - starts[0]).astype(np.int64)) // 7 + 1
+        return int((starts[1].astype("datetime64[M]") - starts[0].astype("datetime64[M]")).astype(np.int64)) + 1
+
+    # The coarsest resolution with at least `min_points` points in the range
+    # (hours if none has)
+    def resolution_for(self, start, end, min_points):
+        for resolution in reversed(RESOLUTIONS):
+            if self.count(resolution, start, end) >= min_points:
+                return resolution
+        return "hour"
+
+    def _sum_days(self, start, end):
+        d0 = int((start - self.first_day).astype(np.int64))
+        d1 = int((end - self.first_day).astype(np.int64)) + 1
+        d0, d1 = min(max(d0, 0), len(self.days)), min(max(d1, 0), len(self.days))
+        return float(self.cum[max(d1, d0)] - self.cum[d0])
+
+    # Total amount of start <= day <= end
+    def total(self, start, end):
+        with self._lock:
+            if self.first_day is None:
+                return 0.0
+            return self._sum_days(to_day(start), to_day(end))
+
+    # Totals of the range at day, week or month resolution as a
+    # (period, sum_of_amount) frame. Periods cut by the range edges are
+    # summed over just the days inside it.
+    def between(self, resolution, start, end):
+        start, end = to_day(start), to_day(end)
+        with self._lock:
+            if self.first_day is None:
+                return pd.DataFrame({"period": pd.DatetimeIndex([]), "sum_of_amount": []})
+
+            if resolution == "day":
+                lo = max(start, self.first_day)
+                hi = min(end, self.first_day + len(self.days) - 1)
+                periods = np.arange(lo, hi + 1, dtype="datetime64[D]")
+                d0 = int((lo - self.first_day).astype(np.int64))
+                totals = self.days[d0:d0 + len(periods)].copy()
+            else:
+                starts = _PERIOD_START[resolution](np.array([start, end]))
+                if resolution == "week":
+                    periods = np.arange(starts[0], starts[1] + 1, 7, dtype="datetime64[D]")
+                else:
+                    months = np.arange(starts[0].astype("datetime64[M]"), starts[1].astype("datetime64[M]") + 1)
+                    periods = months.astype("datetime64[D]")
+                ends = np.append(periods[1:], _next_period(resolution, periods[-1])) - 1
+                stored = self.periods[resolution]
+                totals = np.array([
+                    stored.get(p, 0.0) if p >= start and e <= end else self._sum_days(max(p, start), min(e, end))
+                    for p, e in zip(periods, ends)
+                ])
+
+        return pd.DataFrame({"period": periods.astype("datetime64[ns]"), "sum_of_amount": totals})
+
+
+def _next_period(resolution, start):
+    if resolution == "week":
+        return start + 7
+    return (start.astype("datetime64[M]") + 1).astype("datetime64[D]")
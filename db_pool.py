@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# A small process-wide pool of DB-API connections. Connections are opened
+# through the given factory (e.g. utility.connect_mysql), pinged before reuse
+# when they've been idle for a while and replaced when they have gone stale.
+class ConnectionPool:
+
+    def __init__(self, connect, size=5, timeout=30, ping_after=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._stats = {
+            "created": 0,
+            "reconnects": 0,
+            "acquired": 0,
+            "waited": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+        }
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"No database connection free after {self.timeout}s (pool size {self.size})")
+        waited = time.perf_counter() - start
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            if waited > 0.001:
+                self._stats["waited"] += 1
+        return conn
+
+    def release(self, conn, broken=False):
+        if not broken:
+            try:
+                # End the read transaction so the next user doesn't see an old snapshot
+                conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            self._close(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def _checkout(self):
+        with self._lock:
+            item = self._idle.pop() if self._idle else None
+
+        if item is None:
+            return self._open()
+
+        conn, idle_since = item
+        if time.monotonic() - idle_since > self.ping_after and not self._alive(conn):
+            self._close(conn)
+            with self._lock:
+                self._stats["reconnects"] += 1
+            return self._open()
+        return conn
+
+    def _open(self):
+        conn = self.connect()
+        with self._lock:
+            self._stats["created"] += 1
+        return conn
+
+    def _alive(self, conn):
+        ping = getattr(conn, "ping", None)
+        if ping is None:
+            return True
+        try:
+            ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close(conn)
+
+    # Utilisation and wait time figures for the debug view
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+        stats["utilisation"] = stats["in_use"] / self.size
+        stats["avg_wait_seconds"] = stats["wait_seconds"] / stats["acquired"] if stats["acquired"] else 0.0
+        return stats
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+# Level-of-detail reduction for long hourly series before they reach Plotly.
+# Both methods return sorted row positions to keep, always including the first
+# and last point and the global maximum and minimum.
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def _with_extremes(y, keep):
+    extremes = [0, len(y) - 1, int(np.argmax(y)), int(np.argmin(y))]
+    return np.unique(np.concatenate([keep, extremes]))
+
+
+# Largest-Triangle-Three-Buckets: keeps the points that best preserve the
+# visual shape of the series
+def lttb_indices(x, y, max_points):
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return _with_extremes(y, keep)
+
+
+# Min/max bucketing: the highest and lowest point of each bucket, so every
+# local peak and dip survives
+def minmax_indices(y, max_points):
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points or max_points < 4:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, max_points // 2 + 1).astype(np.int64)
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            keep.append(start + int(np.argmax(y[start:end])))
+            keep.append(start + int(np.argmin(y[start:end])))
+    return _with_extremes(y, np.asarray(keep, dtype=np.int64))
+
+
+# Rows of `df` to plot: at most about max_points, chosen by `method`
+def downsample_frame(df, x, y, max_points, method="lttb"):
+    if len(df) <= max_points:
+        return df
+    if method == "minmax":
+        keep = minmax_indices(df[y].to_numpy(), max_points)
+    else:
+        keep = lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)
+    return df.iloc[keep]
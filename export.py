@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from schema import HOURLY_DTYPES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+
+EXPORT_FORMATS = {"CSV": ("csv", "text/csv")}
+if pa is not None:
+    EXPORT_FORMATS["Parquet"] = ("parquet", "application/vnd.apache.parquet")
+
+
+# Rows of a (sql, params) query as DataFrames of at most `chunksize` rows,
+# fetched from the cursor as they're needed
+def iter_chunks(conn, query, chunksize=10_000):
+    sql, params = query
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=columns)
+    finally:
+        cursor.close()
+
+
+# Same column types in every chunk (and so every Parquet row group): dates as
+# datetimes, my_hour as in the frames, every amount column as float64
+def typed_chunk(chunk):
+    chunk["my_date"] = pd.to_datetime(chunk["my_date"])
+    for column in chunk.columns.drop("my_date"):
+        chunk[column] = chunk[column].astype(HOURLY_DTYPES.get(column, "float64"))
+    return chunk
+
+
+def _write_csv(chunks, path):
+    with open(path, "w", newline="") as f:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+
+
+def _write_parquet(chunks, path):
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+
+
+# Write the chunks to a temporary file one at a time (one Parquet row group
+# per chunk) and return the finished file's bytes. Only one chunk of rows
+# is held in memory while the export is built.
+def export_bytes(chunks, fmt):
+    suffix, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix="airtel-export-", suffix=f".{suffix}")
+    os.close(fd)
+    chunks = (typed_chunk(chunk) for chunk in chunks)
+    try:
+        if fmt == "Parquet":
+            _write_parquet(chunks, path)
+        else:
+            _write_csv(chunks, path)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
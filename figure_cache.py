@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+
+# LRU cache of built Plotly figures shared by all sessions. Keys should carry
+# everything a figure depends on (data version, section, date range, selected
+# view); entries are evicted least recently used first once either the entry
+# count or the approximate serialized size goes over its cap.
+class FigureCache:
+
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+
+        # Build outside the lock; two sessions missing at once just both build
+        figure = build()
+        size = len(figure.to_json())
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (figure, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+        return figure
+
+    # Serialized size of a cached figure, or None if it isn't cached
+    def size_of(self, figure):
+        with self._lock:
+            for cached, size in self._entries.values():
+                if cached is figure:
+                    return size
+        return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,80 @@
+import json
+import logging
+
+import numpy as np
+import plotly.graph_objects as go
+
+logger = logging.getLogger("airtel.payload")
+
+
+# Compact rendering for figures sent to the browser. Plotly already ships
+# numeric numpy arrays as base64 typed arrays; what bloats a payload is date
+# axes sent as ISO strings, line traces drawn as SVG paths and the default
+# template. compact_figure rewrites a built figure so that
+#   - datetime x values become epoch milliseconds on a date axis, or just
+#     x0/dx when the points are evenly spaced (the usual hourly series),
+#   - y values are numpy arrays (typed arrays in the JSON),
+#   - scatter traces are drawn with WebGL (scattergl),
+#   - the Python-side template is dropped (Streamlit applies its own theme).
+# Hover templates like %{x|%Y-%m-%d %H} keep working on the date axis.
+
+
+def _epoch_ms(values):
+    values = np.asarray(values)
+    if not np.issubdtype(values.dtype, np.datetime64):
+        return None
+    return values.astype("datetime64[ms]").astype(np.int64).astype(np.float64)
+
+
+def _compact_y(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        return values
+    return values.astype(np.float64)
+
+
+def _compact_trace(trace):
+    data = trace.to_plotly_json()
+    if trace.type == "scatter":
+        data["type"] = "scattergl"
+
+    if data.get("y") is not None:
+        data["y"] = _compact_y(data["y"])
+
+    x = _epoch_ms(data["x"]) if data.get("x") is not None else None
+    if x is not None:
+        steps = np.diff(x)
+        if len(x) > 1 and (steps == steps[0]).all():
+            data.pop("x")
+            data["x0"], data["dx"] = x[0], steps[0]
+        else:
+            data["x"] = x
+    return x is not None, data
+
+
+def compact_figure(figure):
+    traces = []
+    date_axes = set()
+    for trace in figure.data:
+        if trace.type not in ("bar", "scatter", "scattergl"):
+            return figure
+        is_date, data = _compact_trace(trace)
+        if is_date:
+            date_axes.add(data.get("xaxis", "x"))
+        traces.append(data)
+
+    layout = figure.layout.to_plotly_json()
+    layout["template"] = {}
+    for axis in date_axes:
+        name = "xaxis" + axis[1:]
+        layout[name] = {**layout.get(name, {}), "type": "date"}
+    return go.Figure(data=traces, layout=layout)
+
+
+# Bytes of the JSON a figure is shipped to the browser as
+def payload_bytes(figure):
+    return len(figure.to_json())
+
+
+def log_payload(section, size, compact):
+    logger.info(json.dumps({"metric": "figure_payload_bytes", "section": section, "bytes": size, "compact": compact}))
@@ -0,0 +1,124 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from schema import prepare_hourly
+from startup import lazy_module
+
+# Same hour one day and one week back
+LAGS = (24, 168)
+HOUR = np.timedelta64(1, "h")
+
+
+# The frame's hourly amounts on a gap-free hourly axis (missing hours NaN):
+# (first hour, amounts)
+def hourly_series(frame):
+    times = frame["my_datetime"].to_numpy().astype("datetime64[h]")
+    offsets = (times - times[0]).astype(np.int64)
+    amounts = np.full(offsets[-1] + 1, np.nan)
+    amounts[offsets] = frame["sum_of_amount"].to_numpy(dtype=np.float64)
+    return times[0], amounts
+
+
+# Feature matrix for the hours at positions `index` of a series starting at
+# first_hour: the lagged amounts plus one-hot hour of day and day of week
+# (first level dropped, the model has an intercept)
+def build_features(first_hour, amounts, index):
+    index = np.asarray(index, dtype=np.int64)
+    hours = first_hour + index * HOUR
+    hour_of_day = (hours.astype(np.int64) % 24)
+    day_of_week = ((hours.astype("datetime64[D]").astype(np.int64) + 3) % 7)
+
+    columns = [amounts[index - lag] for lag in LAGS]
+    columns.append(np.eye(24)[hour_of_day][:, 1:].T)
+    columns.append(np.eye(7)[day_of_week][:, 1:].T)
+    return np.vstack([np.atleast_2d(c) for c in columns]).T
+
+
+# Linear model of the next hours from the same hours a day and a week before.
+# Every lag is at least 24 hours, so the whole next day is predicted in one
+# step from known amounts.
+class HourlyForecaster:
+
+    def __init__(self, first_hour, amounts, model):
+        self.first_hour = first_hour
+        self.amounts = amounts
+        self.model = model
+
+    @classmethod
+    def fit(cls, frame):
+        first_hour, amounts = hourly_series(frame)
+        index = np.arange(max(LAGS), len(amounts))
+        X = build_features(first_hour, amounts, index)
+        y = amounts[index]
+        usable = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        if usable.sum() < X.shape[1]:
+            return None
+
+        linear_model = lazy_module("sklearn.linear_model")
+        model = linear_model.LinearRegression().fit(X[usable], y[usable])
+        return cls(first_hour, amounts, model)
+
+    # The `hours` after the last fitted hour, as an hourly frame
+    def predict(self, hours=24):
+        index = np.arange(len(self.amounts), len(self.amounts) + hours)
+        extended = np.concatenate([self.amounts, np.full(hours, np.nan)])
+        X = build_features(self.first_hour, extended, index)
+        # Hours missing a day or week back fall back to the mean amount
+        if np.isnan(X).any():
+            mean = np.nanmean(self.amounts)
+            X = np.where(np.isnan(X), mean, X)
+        predicted = np.clip(self.model.predict(X), 0, None)
+
+        times = pd.DatetimeIndex(self.first_hour + index * HOUR)
+        return prepare_hourly(pd.DataFrame({
+            "my_date": times.normalize(),
+            "my_hour": times.hour,
+            "sum_of_amount": predicted,
+        }))
+
+
+# Next-day forecast from a loader's rows. The newest hour may still be
+# accumulating, so it's left out: the model is fitted on complete hours and
+# the forecast starts at that newest hour. The model is refitted only when a
+# new hour lands (keyed on the loader watermark); the forecast itself is redone
+# whenever the rows change, which is a single small matrix product.
+class ForecastEngine:
+
+    def __init__(self, hours=24):
+        self.hours = hours
+        self.model = None
+        self.model_key = None
+        self.forecast = None
+        self.source_version = None
+        # Bumped on every new forecast; key for charts built from it
+        self.version = 0
+        self.stats = {"fits": 0, "forecasts": 0}
+        self._lock = threading.Lock()
+
+    def sync(self, loader):
+        frame, generation, _ = loader.snapshot()
+        if len(frame) < 2:
+            return None
+        with self._lock:
+            version = frame.attrs.get("version")
+            if self.forecast is not None and version == self.source_version:
+                return self.forecast
+            complete = frame.iloc[:-1]
+
+            model_key = (generation, loader.watermark)
+            if model_key != self.model_key:
+                self.model = HourlyForecaster.fit(complete)
+                self.model_key = model_key
+                self.stats["fits"] += 1
+            if self.model is None:
+                return None
+
+            # Keep the fitted coefficients, only refresh the lagged inputs
+            self.model.first_hour, self.model.amounts = hourly_series(complete)
+            self.forecast = self.model.predict(self.hours)
+            self.forecast.attrs["version"] = self.version = self.version + 1
+            self.source_version = version
+            self.stats["forecasts"] += 1
+            return self.forecast
@@ -0,0 +1,108 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from rollups import BUCKET_BINS, BUCKET_LABELS
+from schema import prepare_hourly, to_day
+
+
+# Hour columns of each time-of-day bucket; pd.cut bins are right-closed so
+# (0, 5] is hours 1-5, (5, 11] is hours 6-11 and so on
+BUCKET_HOURS = [slice(lo + 1, hi + 1) for lo, hi in zip(BUCKET_BINS[:-1], BUCKET_BINS[1:])]
+
+
+# Hourly amounts as a dense days x 24 matrix, one row per day starting at
+# first_day. Prefix sums over the flattened hours and over each hour column
+# turn range, per-day and per-bucket totals into O(1) lookups, and a date
+# range is a plain row slice of the matrix.
+class HourGrid:
+
+    def __init__(self, first_day, values, present):
+        self.first_day = to_day(first_day)
+        self.values = values
+        self.present = present
+        self.cum = np.concatenate(([0.0], values.ravel().cumsum()))
+        self.col_cum = np.vstack([np.zeros((1, 24)), values.cumsum(axis=0)])
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.empty:
+            return cls(pd.Timestamp.today(), np.zeros((0, 24)), np.zeros((0, 24), dtype=bool))
+
+        dates = pd.to_datetime(df['my_date']).to_numpy().astype('datetime64[D]')
+        first_day = dates.min()
+        offsets = (dates - first_day).astype(np.int64)
+        hours = df['my_hour'].to_numpy(dtype=np.int64)
+
+        values = np.zeros((offsets.max() + 1, 24))
+        present = np.zeros(values.shape, dtype=bool)
+        np.add.at(values, (offsets, hours), df['sum_of_amount'].to_numpy(dtype=float))
+        present[offsets, hours] = True
+        return cls(first_day, values, present)
+
+    @property
+    def n_days(self):
+        return len(self.values)
+
+    def covers(self, start):
+        return self.n_days > 0 and to_day(start) >= self.first_day
+
+    # [d0, d1) row bounds of start <= day <= end, clipped to the grid
+    def _rows(self, start, end):
+        d0 = int((to_day(start) - self.first_day).astype(np.int64))
+        d1 = int((to_day(end) - self.first_day).astype(np.int64)) + 1
+        d0 = min(max(d0, 0), self.n_days)
+        d1 = min(max(d1, d0), self.n_days)
+        return d0, d1
+
+    # Zero-copy view of the days in the range
+    def between(self, start, end):
+        d0, d1 = self._rows(start, end)
+        return self.values[d0:d1]
+
+    def range_total(self, start, end):
+        d0, d1 = self._rows(start, end)
+        return float(self.cum[d1 * 24] - self.cum[d0 * 24])
+
+    def day_totals(self, start, end):
+        d0, d1 = self._rows(start, end)
+        ends = self.cum[(d0 + 1) * 24:(d1 * 24) + 1:24]
+        starts = self.cum[d0 * 24:d1 * 24:24]
+        return pd.Series(ends - starts, index=self.first_day + np.arange(d0, d1), name='sum_of_amount')
+
+    def hour_totals(self, start, end):
+        d0, d1 = self._rows(start, end)
+        return self.col_cum[d1] - self.col_cum[d0]
+
+    def bucket_totals(self, start, end):
+        hours = self.hour_totals(start, end)
+        return pd.Series([hours[cols].sum() for cols in BUCKET_HOURS], index=BUCKET_LABELS)
+
+    # Long-format (my_date, my_hour, sum_of_amount) rows of the range, only
+    # for the hours that were actually present
+    def to_frame(self, start, end):
+        d0, d1 = self._rows(start, end)
+        days, hours = np.nonzero(self.present[d0:d1])
+        return prepare_hourly(pd.DataFrame({
+            'my_date': self.first_day + d0 + days,
+            'my_hour': hours,
+            'sum_of_amount': self.values[d0:d1][days, hours],
+        }))
+
+
+# Keeps a grid built from the loader's current rows
+class GridStore:
+
+    def __init__(self):
+        self.grid = HourGrid.from_frame(pd.DataFrame())
+        self.source = None
+        self._lock = threading.Lock()
+
+    def sync(self, loader):
+        frame, _, _ = loader.snapshot()
+        with self._lock:
+            if frame is not self.source:
+                self.grid = HourGrid.from_frame(frame)
+                self.source = frame
+            return self.grid
@@ -0,0 +1,187 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from queries import TableQueries, read_frame, read_one
+
+
+# Keeps an in-memory copy of an hour-keyed table (my_date, my_hour, ...) and
+# tops it up with only the rows at or after the (my_date, my_hour) high-water
+# mark. A cheap probe (last row, row count and total amount) decides whether
+# anything changed; a changed total the delta doesn't account for means older
+# rows were rewritten in place, and the window is reloaded in full.
+# With window_days set, only the trailing window_days of data are held.
+# `prepare` is applied to every fetched chunk (e.g. schema.prepare_hourly).
+class IncrementalLoader:
+
+    def __init__(self, table, window_days=None, placeholder="%s", max_age=6 * 3600, prepare=None):
+        self.queries = TableQueries(table, placeholder=placeholder)
+        self.window_days = window_days
+        self.prepare = prepare
+        # Force a full reload now and then so in-place corrections of old rows
+        # are picked up as well
+        self.max_age = max_age
+        # (frame, generation, window_start) as last published. A refresh
+        # builds new rows aside and swaps this in with one assignment, so
+        # readers never wait on the refresh lock (and its database round
+        # trips) or see a half-applied refresh. The generation is bumped on
+        # every full load so derived stores know to rebuild.
+        self._published = (pd.DataFrame(), 0, None)
+        self.state = None
+        self.loaded_at = 0.0
+        self.probed_at = 0.0
+        # Bumped whenever the rows change at all; cheap key for derived caches
+        self.version = 0
+        # Set by the caller while the database is unreachable and the rows
+        # are being served as they are
+        self.last_error = None
+        self.stats = {"probes": 0, "full_loads": 0, "delta_loads": 0, "rows_fetched": 0}
+        # Serialises refreshes only; reads go through _published
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        return self.queries.table
+
+    @property
+    def frame(self):
+        return self._published[0]
+
+    @property
+    def generation(self):
+        return self._published[1]
+
+    @property
+    def window_start(self):
+        return self._published[2]
+
+    @property
+    def watermark(self):
+        if self.state is None or self.state[2] is None:
+            return None
+        return self.state[2][:2]
+
+    # Probe the table: (row count in the window, total amount in the window,
+    # last (my_date, my_hour, sum_of_amount) row)
+    def probe(self, conn):
+        last_row = read_one(conn, self.queries.last_row())
+        start = None
+        if last_row is not None and self.window_days is not None:
+            start = last_row[0] - timedelta(days=self.window_days)
+        row_count, total = read_one(conn, self.queries.summary(start))
+        self.stats["probes"] += 1
+        self.probed_at = time.time()
+        total = float(total) if total is not None else 0.0
+        return (row_count, total, tuple(last_row) if last_row else None), start
+
+    def refresh(self, conn):
+        with self._lock:
+            db_state, start = self.probe(conn)
+            stale = time.time() - self.loaded_at > self.max_age
+            frame, generation, window_start = self._published
+
+            if db_state == self.state and not stale:
+                return frame
+
+            can_delta = (
+                not stale
+                and self.watermark is not None
+                and db_state[2] is not None
+                and len(frame) == self.state[0]
+            )
+            if can_delta:
+                frame = self._trim(self._delta_load(conn, frame), start)
+                if start is not None:
+                    window_start = start
+            # Rows were back-filled, deleted or rewritten behind the watermark
+            if not can_delta or not self._matches(frame, db_state):
+                frame = self._full_load(conn, start)
+                generation += 1
+                window_start = start
+
+            self._publish(frame, generation, window_start)
+            # A mismatch here means rows landed mid-refresh; reload next time
+            self.state = db_state if self._matches(frame, db_state) else None
+            return frame
+
+    # Whether `frame` holds the probed row count and total amount
+    @staticmethod
+    def _matches(frame, db_state):
+        if len(frame) != db_state[0]:
+            return False
+        total = float(frame["sum_of_amount"].sum()) if not frame.empty else 0.0
+        return bool(np.isclose(total, db_state[1], rtol=1e-9, atol=1e-6))
+
+    # The current rows, the generation they belong to and the window start
+    def snapshot(self):
+        return self._published
+
+    # What the frame holds, stored alongside it in a snapshot
+    def snapshot_meta(self):
+        frame, _, window_start = self._published
+        watermark = self.watermark
+        return {
+            "table": self.table,
+            "rows": len(frame),
+            "watermark": [str(watermark[0]), int(watermark[1])] if watermark else None,
+            "window_start": str(window_start) if window_start is not None else None,
+            "loaded_at": self.loaded_at,
+        }
+
+    # Seed an empty loader from a snapshot. The last row's amount isn't kept,
+    # so the first refresh always re-reads from the watermark on.
+    def restore(self, frame, meta):
+        with self._lock:
+            if self.state is not None or not self.frame.empty or meta.get("table") != self.table or not meta.get("watermark"):
+                return False
+            wm_date, wm_hour = meta["watermark"]
+            window_start = None
+            if meta.get("window_start"):
+                window_start = date.fromisoformat(meta["window_start"][:10])
+            self._publish(frame, self.generation + 1, window_start)
+            self.state = (len(frame), None, (date.fromisoformat(wm_date[:10]), wm_hour, None))
+            self.loaded_at = meta.get("loaded_at", 0.0)
+            return True
+
+    def _full_load(self, conn, start):
+        query = self.queries.since(start) if start is not None else self.queries.all()
+        frame = self._read(conn, query)
+        self.loaded_at = time.time()
+        self.stats["full_loads"] += 1
+        self.stats["rows_fetched"] += len(frame)
+        return frame
+
+    def _delta_load(self, conn, frame):
+        delta = self._read(conn, self.queries.since_hour(*self.watermark))
+        self.stats["delta_loads"] += 1
+        self.stats["rows_fetched"] += len(delta)
+
+        # The last hour is re-read as it may still be accumulating
+        return pd.concat([frame.iloc[:-1], delta], ignore_index=True)
+
+    # Swap in new rows in one step. The version rides along in frame.attrs
+    # (and so in any copy of it) so callers can key caches on the rows they
+    # actually hold.
+    def _publish(self, frame, generation, window_start):
+        if frame is not self._published[0]:
+            self.version += 1
+            frame.attrs["version"] = self.version
+        self._published = (frame, generation, window_start)
+
+    def _read(self, conn, query):
+        frame = read_frame(conn, query)
+        return self.prepare(frame) if self.prepare is not None else frame
+
+    # Drop rows that have slid out of the window
+    @staticmethod
+    def _trim(frame, start):
+        if start is None or frame.empty:
+            return frame
+        dates = pd.to_datetime(frame["my_date"])
+        first_kept = int((dates < pd.Timestamp(start)).sum())
+        if first_kept:
+            return frame.iloc[first_kept:].reset_index(drop=True)
+        return frame
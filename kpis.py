@@ -0,0 +1,157 @@
+import threading
+from collections import deque
+
+import pandas as pd
+
+
+# The sidebar KPIs are kept in one dict so they can come from the sliding
+# window below or from the database:
+#   total                         -> amount
+#   highest_day / lowest_day      -> (my_date, amount)
+#   highest_hour / lowest_hour    -> (my_date, my_hour, amount)
+
+
+# Build the KPIs from the rows of TableQueries.kpi_summary
+def kpis_from_rows(rows):
+    by_kpi = {row[0]: row[1:] for row in rows}
+    if by_kpi.get("total", (None, None, None))[2] is None:
+        return None
+
+    def day(name):
+        my_date, _, amount = by_kpi[name]
+        return (pd.Timestamp(my_date), float(amount))
+
+    def hour(name):
+        my_date, my_hour, amount = by_kpi[name]
+        return (pd.Timestamp(my_date), int(my_hour), float(amount))
+
+    return {
+        "total": float(by_kpi["total"][2]),
+        "highest_day": day("highest_day"),
+        "lowest_day": day("lowest_day"),
+        "highest_hour": hour("highest_hour"),
+        "lowest_hour": hour("lowest_hour"),
+    }
+
+
+# Rolling "last 30 days" KPIs kept as a sliding window. A running total plus
+# monotonic deques of the daily and hourly maxima/minima make adding an hour
+# or expiring a day O(1) (amortised). The newest hour and day may still be
+# accumulating, so they're held aside and only committed once a later hour
+# arrives.
+class SlidingKPIs:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = None
+        self.source = None
+        self._reset()
+
+    def _reset(self):
+        self.days = deque()          # committed days in the window: (my_date, total)
+        self.days_max = deque()      # (my_date, total), totals decreasing
+        self.days_min = deque()      # (my_date, total), totals increasing
+        self.hours_max = deque()     # (my_date, my_hour, amount), amounts decreasing
+        self.hours_min = deque()     # (my_date, my_hour, amount), amounts increasing
+        self.total = 0.0             # sum of committed days
+        self.open_day = None
+        self.open_day_total = 0.0    # committed hours of the open day
+        self.pending = None          # newest (my_date, my_hour, amount)
+
+    def push(self, my_date, my_hour, amount):
+        if self.pending is not None:
+            if (my_date, my_hour) == self.pending[:2]:
+                self.pending = (my_date, my_hour, amount)
+                return
+            self._commit_hour(self.pending)
+
+        if my_date != self.open_day:
+            if self.open_day is not None:
+                self._commit_day((self.open_day, self.open_day_total))
+            self.open_day = my_date
+            self.open_day_total = 0.0
+        self.pending = (my_date, my_hour, amount)
+
+    def _commit_hour(self, item):
+        self.open_day_total += item[2]
+        # Keep the earlier entry on ties, like idxmax/idxmin
+        while self.hours_max and self.hours_max[-1][2] < item[2]:
+            self.hours_max.pop()
+        self.hours_max.append(item)
+        while self.hours_min and self.hours_min[-1][2] > item[2]:
+            self.hours_min.pop()
+        self.hours_min.append(item)
+
+    def _commit_day(self, item):
+        self.days.append(item)
+        self.total += item[1]
+        while self.days_max and self.days_max[-1][1] < item[1]:
+            self.days_max.pop()
+        self.days_max.append(item)
+        while self.days_min and self.days_min[-1][1] > item[1]:
+            self.days_min.pop()
+        self.days_min.append(item)
+
+    # Drop everything dated before `start`
+    def expire(self, start):
+        while self.days and self.days[0][0] < start:
+            self.total -= self.days.popleft()[1]
+        for window in (self.days_max, self.days_min, self.hours_max, self.hours_min):
+            while window and window[0][0] < start:
+                window.popleft()
+
+    # Feed the rows the loader gained since the last sync
+    def sync(self, loader):
+        frame, generation, _ = loader.snapshot()
+        with self._lock:
+            if frame is self.source:
+                return
+            self.source = frame
+
+            first = 0
+            if generation != self.generation:
+                self._reset()
+                self.generation = generation
+            elif self.pending is not None:
+                # Walk back from the end to the newest hour seen so far
+                last_key = (self.pending[0], self.pending[1])
+                first = len(frame)
+                while first > 0 and (pd.Timestamp(frame['my_date'].iat[first - 1]), int(frame['my_hour'].iat[first - 1])) >= last_key:
+                    first -= 1
+
+            rows = frame.iloc[first:]
+            for my_date, my_hour, amount in zip(rows['my_date'], rows['my_hour'], rows['sum_of_amount']):
+                self.push(pd.Timestamp(my_date), int(my_hour), float(amount))
+
+    # KPIs for the days dated on or after `start` (None if there are none).
+    # Expired days are gone for good, so `start` must only move forward.
+    def kpis(self, start):
+        with self._lock:
+            self.expire(start)
+            if self.open_day is None or self.open_day < start:
+                return None
+
+            open_total = self.open_day_total + self.pending[2]
+            open_day = (self.open_day, open_total)
+
+            highest_day = open_day
+            if self.days_max and self.days_max[0][1] >= open_total:
+                highest_day = self.days_max[0]
+            lowest_day = open_day
+            if self.days_min and self.days_min[0][1] <= open_total:
+                lowest_day = self.days_min[0]
+
+            highest_hour = self.pending
+            if self.hours_max and self.hours_max[0][2] >= self.pending[2]:
+                highest_hour = self.hours_max[0]
+            lowest_hour = self.pending
+            if self.hours_min and self.hours_min[0][2] <= self.pending[2]:
+                lowest_hour = self.hours_min[0]
+
+            return {
+                "total": self.total + open_total,
+                "highest_day": highest_day,
+                "lowest_day": lowest_day,
+                "highest_hour": highest_hour,
+                "lowest_hour": lowest_hour,
+            }
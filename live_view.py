@@ -0,0 +1,43 @@
+import numpy as np
+
+
+# The points of one live chart trace: the trailing `length` rows of an hourly
+# table. extend() only looks at the table's rows from the last hour already
+# held onwards (that hour may still have been accumulating) and appends them,
+# so a refresh costs a binary search plus the new hours. After a full reload
+# of the table (new generation) the points are taken afresh.
+class LiveSeries:
+
+    def __init__(self, length):
+        self.length = length
+        self.x = np.empty(0, dtype="datetime64[ns]")
+        self.y = np.empty(0)
+        self.generation = None
+
+    @property
+    def last_hour(self):
+        return self.x[-1] if self.x.size else None
+
+    # Bring the points up to date with `frame`; True if anything changed
+    def extend(self, frame, generation):
+        if frame.empty:
+            return False
+        times = frame["my_datetime"].to_numpy().astype("datetime64[ns]")
+        amounts = frame["sum_of_amount"].to_numpy()
+
+        if generation != self.generation or not self.x.size:
+            self.x, self.y = times[-self.length:], amounts[-self.length:]
+            self.generation = generation
+            return True
+
+        first_new = int(np.searchsorted(times, self.last_hour))
+        new_x, new_y = times[first_new:], amounts[first_new:]
+        if not new_x.size:
+            return False
+        if new_x.size == 1 and new_x[0] == self.x[-1] and new_y[0] == self.y[-1]:
+            return False
+
+        keep = int(np.searchsorted(self.x, new_x[0]))
+        self.x = np.concatenate([self.x[:keep], new_x])[-self.length:]
+        self.y = np.concatenate([self.y[:keep], new_y])[-self.length:]
+        return True
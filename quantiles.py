@@ -0,0 +1,125 @@
+import os
+import threading
+
+import numpy as np
+
+from schema import epoch_hours
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# Quantile sketches of hourly amounts, one per (weekday, hour of day) cell.
+# Each is a log-bucketed histogram (DDSketch style): an amount x lands in
+# bucket ceil(log_gamma(x)), so any quantile read back is within
+# `relative_accuracy` of the true value. The buckets are a fixed range
+# (amounts from 1 up to max_amount; smaller ones share a bucket), so memory
+# is the same for a week of history or ten years, sketches merge by adding
+# counts (e.g. the 7 weekdays of an hour), and the whole set saves as one
+# small .npz file.
+class QuantileSketches:
+
+    def __init__(self, relative_accuracy=0.01, max_amount=1e12):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.n_buckets = int(np.ceil(np.log(max_amount) / self.log_gamma)) + 1
+        self.counts = np.zeros((7, 24, self.n_buckets), dtype=np.int64)
+        self.last_hour = None
+        self._lock = threading.Lock()
+
+    def _bucket(self, amounts):
+        amounts = np.maximum(np.asarray(amounts, dtype=np.float64), 1.0)
+        return np.minimum(np.ceil(np.log(amounts) / self.log_gamma).astype(np.int64), self.n_buckets - 1)
+
+    def _value(self, bucket):
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    # Add hourly amounts at epoch hours `hours`
+    def add(self, hours, amounts):
+        hours = np.asarray(hours, dtype=np.int64)
+        weekday = (hours // 24 + 3) % 7
+        np.add.at(self.counts, (weekday, hours % 24, self._bucket(amounts)), 1)
+
+    # Add the frame's hours after the last one added, except the newest
+    # (it may still be accumulating); True if any were added
+    def sync(self, frame):
+        if frame.empty:
+            return False
+        with self._lock:
+            hours = epoch_hours(frame)
+            first = 0 if self.last_hour is None else int(np.searchsorted(hours, self.last_hour, side="right"))
+            rows = slice(first, len(hours) - 1)
+            if not len(hours[rows]):
+                return False
+            self.add(hours[rows], frame["sum_of_amount"].to_numpy(dtype=np.float64)[rows])
+            self.last_hour = int(hours[rows][-1])
+            return True
+
+    # Counts merged over the selected cells: weekday and hour may each be an
+    # index, a list or None for all
+    def _merged(self, weekday=None, hour=None):
+        counts = self.counts
+        counts = counts[weekday] if weekday is not None else counts
+        if counts.ndim == 3:
+            counts = counts.sum(axis=0)
+        counts = counts[hour] if hour is not None else counts
+        return counts if counts.ndim == 1 else counts.sum(axis=0)
+
+    def quantile(self, q, weekday=None, hour=None):
+        with self._lock:
+            counts = self._merged(weekday, hour)
+        total = counts.sum()
+        if not total:
+            return None
+        bucket = int(np.searchsorted(counts.cumsum(), q * (total - 1), side="right"))
+        return float(self._value(bucket))
+
+    # Quantiles of each hour of the day over all weekdays: (len(qs), 24)
+    def hourly_bands(self, qs):
+        with self._lock:
+            counts = self.counts.sum(axis=0)
+        cum = counts.cumsum(axis=1)
+        totals = cum[:, -1]
+        bands = np.full((len(qs), 24), np.nan)
+        for h in np.flatnonzero(totals):
+            buckets = np.searchsorted(cum[h], np.asarray(qs) * (totals[h] - 1), side="right")
+            bands[:, h] = self._value(buckets)
+        return bands
+
+    # Share (0-100) of past amounts of that weekday and hour that are at or
+    # below `amount`
+    def percentile_rank(self, amount, weekday, hour):
+        with self._lock:
+            counts = self.counts[weekday, hour]
+        total = counts.sum()
+        if not total:
+            return None
+        return float(100 * counts[:self._bucket(amount) + 1].sum() / total)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        with self._lock:
+            np.savez_compressed(
+                tmp_path,
+                counts=self.counts,
+                relative_accuracy=self.relative_accuracy,
+                last_hour=-1 if self.last_hour is None else self.last_hour,
+            )
+            os.replace(tmp_path, path)
+
+    # Restore saved counts into this (empty) set; False if there's no usable file
+    def load(self, path):
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as saved:
+                if saved["counts"].shape != self.counts.shape or float(saved["relative_accuracy"]) != self.relative_accuracy:
+                    return False
+                with self._lock:
+                    self.counts = saved["counts"].copy()
+                    last_hour = int(saved["last_hour"])
+                    self.last_hour = None if last_hour < 0 else last_hour
+        except (OSError, ValueError, KeyError):
+            return False
+        return True
@@ -0,0 +1,128 @@
+import pandas as pd
+
+
+USAGE_TABLE = "Airtel_Hour_Wise_Data"
+PREDICTION_TABLE = "vr.airtel_daily_prediction"
+
+# The only columns the dashboard uses
+HOURLY_COLUMNS = ("my_date", "my_hour", "sum_of_amount")
+
+
+# Builds parameterised queries against one hour-keyed table. Every method
+# returns a (sql, params) pair; placeholder is "%s" for mysql.connector and
+# "?" for sqlite3.
+class TableQueries:
+
+    def __init__(self, table, columns=HOURLY_COLUMNS, placeholder="%s"):
+        self.table = table
+        self.columns = columns
+        self.placeholder = placeholder
+
+    def _select(self, where="", params=(), order="ASC", limit=None):
+        p = self.placeholder
+        sql = f"SELECT {', '.join(self.columns)} FROM {self.table}"
+        if where:
+            sql += f" WHERE {where.format(p=p)}"
+        sql += f" ORDER BY my_date {order}, my_hour {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, tuple(params)
+
+    def all(self):
+        return self._select()
+
+    # Rows with start <= my_date <= end
+    def date_range(self, start, end):
+        return self._select("my_date >= {p} AND my_date <= {p}", (start, end))
+
+    # Rows with my_date >= start
+    def since(self, start):
+        return self._select("my_date >= {p}", (start,))
+
+    # Rows at or after the (my_date, my_hour) watermark
+    def since_hour(self, date, hour):
+        return self._select("my_date > {p} OR (my_date = {p} AND my_hour >= {p})", (date, date, hour))
+
+    # The five "last 30 days" KPIs in one round trip: one row per KPI with
+    # (kpi, my_date, my_hour, amount). Ties go to the earliest day/hour, like
+    # pandas idxmax/idxmin.
+    def kpi_summary(self, start):
+        p = self.placeholder
+        hourly = (
+            f"SELECT my_date, my_hour, SUM(sum_of_amount) AS amount FROM {self.table} "
+            f"WHERE my_date >= {p} GROUP BY my_date, my_hour"
+        )
+        daily = "SELECT my_date, SUM(amount) AS amount FROM hourly GROUP BY my_date"
+        sql = (
+            f"WITH hourly AS ({hourly}), daily AS ({daily}) "
+            "SELECT 'total' AS kpi, NULL AS my_date, NULL AS my_hour, SUM(amount) AS amount FROM daily "
+            "UNION ALL SELECT * FROM (SELECT 'highest_day', my_date, NULL, amount FROM daily "
+            "ORDER BY amount DESC, my_date ASC LIMIT 1) AS highest_day "
+            "UNION ALL SELECT * FROM (SELECT 'lowest_day', my_date, NULL, amount FROM daily "
+            "ORDER BY amount ASC, my_date ASC LIMIT 1) AS lowest_day "
+            "UNION ALL SELECT * FROM (SELECT 'highest_hour', my_date, my_hour, amount FROM hourly "
+            "ORDER BY amount DESC, my_date ASC, my_hour ASC LIMIT 1) AS highest_hour "
+            "UNION ALL SELECT * FROM (SELECT 'lowest_hour', my_date, my_hour, amount FROM hourly "
+            "ORDER BY amount ASC, my_date ASC, my_hour ASC LIMIT 1) AS lowest_hour"
+        )
+        return sql, (start,)
+
+    # Rows with start <= my_date <= end next to the same hours of `other`
+    # (NULL where it has none): my_date, my_hour, <name>, <other_name>
+    def joined_range(self, other, start, end, name="actual", other_name="predicted"):
+        p = self.placeholder
+        sql = (
+            f"SELECT a.my_date, a.my_hour, a.sum_of_amount AS {name}, b.sum_of_amount AS {other_name} "
+            f"FROM {self.table} AS a LEFT JOIN {other.table} AS b "
+            "ON b.my_date = a.my_date AND b.my_hour = a.my_hour "
+            f"WHERE a.my_date >= {p} AND a.my_date <= {p} "
+            "ORDER BY a.my_date ASC, a.my_hour ASC"
+        )
+        return sql, (start, end)
+
+    # (my_date, total) per day, optionally from `start` on
+    def daily_totals(self, start=None):
+        where = f"WHERE my_date >= {self.placeholder} " if start is not None else ""
+        sql = f"SELECT my_date, SUM(sum_of_amount) FROM {self.table} {where}GROUP BY my_date ORDER BY my_date"
+        return sql, (start,) if start is not None else ()
+
+    def date_bounds(self):
+        return f"SELECT MIN(my_date), MAX(my_date) FROM {self.table}", ()
+
+    def last_row(self):
+        return self._select(order="DESC", limit=1)
+
+    # (row count, total amount), optionally from `start` on
+    def summary(self, start=None):
+        sql = f"SELECT COUNT(*), SUM(sum_of_amount) FROM {self.table}"
+        if start is None:
+            return sql, ()
+        return f"{sql} WHERE my_date >= {self.placeholder}", (start,)
+
+
+def read_frame(conn, query):
+    sql, params = query
+    return pd.read_sql(sql, conn, params=params or None)
+
+
+def read_all(conn, query):
+    sql, params = query
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def read_one(conn, query):
+    sql, params = query
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        # Drain anything left so the connection can be reused
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    return row
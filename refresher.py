@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger("airtel.refresher")
+
+
+# Process-wide owner of the fetched tables. A daemon thread refreshes every
+# table on a schedule and sessions just read what was last published: the
+# loaders never modify a frame once it's out (each change swaps in a new
+# one), so a session keeps a consistent snapshot for its whole rerun.
+# refresh() for a table that already has a fetch in flight waits for that
+# fetch instead of starting another, so the database sees one fetch per
+# table per cadence however many sessions are open.
+class Refresher:
+
+    def __init__(self, fetch, names, interval):
+        self.fetch = fetch
+        self.names = list(names)
+        self.interval = interval
+        self.refreshed_at = {}
+        self.stats = {"fetches": 0, "coalesced": 0, "errors": 0, "fetch_seconds": 0.0}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Fetch `name` now, or wait for the fetch already in flight
+    def refresh(self, name):
+        with self._lock:
+            done = self._inflight.get(name)
+            owner = done is None
+            if owner:
+                done = self._inflight[name] = threading.Event()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            done.wait()
+            return
+
+        start = time.perf_counter()
+        try:
+            self.fetch(name)
+        finally:
+            with self._lock:
+                del self._inflight[name]
+                self.refreshed_at[name] = time.time()
+                self.stats["fetches"] += 1
+                self.stats["fetch_seconds"] += time.perf_counter() - start
+            done.set()
+
+    def start(self):
+        if self.running or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="airtel-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for name in self.names:
+                try:
+                    self.refresh(name)
+                except Exception:
+                    # Keep the thread alive; the next round tries again
+                    self.stats["errors"] += 1
+                    logger.exception("Refreshing %s failed", name)
+            self._stop.wait(self.interval)
@@ -0,0 +1,90 @@
+import threading
+
+import pandas as pd
+
+
+# Time-of-day buckets, same bins as the pie chart has always used
+BUCKET_BINS = [0, 5, 11, 17, 23]
+BUCKET_LABELS = ['Midnight to 6AM', '6AM to 12PM', '12PM to 6PM', '6PM to Midnight']
+
+DAY_COLUMNS = ['total', 'peak_hour', 'peak_amount', 'min_hour', 'min_amount'] + BUCKET_LABELS
+
+
+def empty_days():
+    return pd.DataFrame(columns=DAY_COLUMNS, index=pd.DatetimeIndex([], name='my_date'), dtype=float)
+
+
+# Summarise hourly rows into one row per day: total, peak/min hour and amount,
+# and the time-of-day bucket totals
+def summarize_days(df):
+    if df.empty:
+        return empty_days()
+
+    hourly = df[['my_date', 'my_hour', 'sum_of_amount']].copy()
+    hourly['my_date'] = pd.to_datetime(hourly['my_date'])
+    # Amounts may be held as narrow ints (see schema.py); sum them as floats
+    hourly['sum_of_amount'] = hourly['sum_of_amount'].astype('float64')
+    hourly = hourly.groupby(['my_date', 'my_hour'])['sum_of_amount'].sum().reset_index()
+
+    amounts = hourly.groupby('my_date')['sum_of_amount']
+    peak = hourly.loc[amounts.idxmax()]
+    low = hourly.loc[amounts.idxmin()]
+
+    days = pd.DataFrame({
+        'total': amounts.sum(),
+        'peak_hour': peak['my_hour'].values,
+        'peak_amount': peak['sum_of_amount'].values,
+        'min_hour': low['my_hour'].values,
+        'min_amount': low['sum_of_amount'].values,
+    })
+
+    bucket = pd.cut(hourly['my_hour'], bins=BUCKET_BINS, labels=BUCKET_LABELS)
+    buckets = hourly.groupby([hourly['my_date'], bucket], observed=False)['sum_of_amount'].sum().unstack(fill_value=0)
+    buckets.columns = [str(label) for label in buckets.columns]
+    days = days.join(buckets.reindex(columns=BUCKET_LABELS)).fillna({label: 0.0 for label in BUCKET_LABELS})
+    return days[DAY_COLUMNS]
+
+
+# Rows of `days` with start <= my_date <= end
+def days_between(days, start, end):
+    return days[(days.index >= start) & (days.index <= end)]
+
+
+# Per-day summary store kept in step with an IncrementalLoader. Only days at or
+# after the last summarised day (which may have been partial) are recomputed;
+# a full reload of the loader rebuilds the store.
+class DailyRollup:
+
+    def __init__(self):
+        self.days = empty_days()
+        self.generation = None
+        self.source = None
+        self.stats = {"rebuilds": 0, "updates": 0, "days_recomputed": 0}
+        self._lock = threading.Lock()
+
+    def sync(self, loader):
+        frame, generation, window_start = loader.snapshot()
+        with self._lock:
+            # The loader swaps in a new frame whenever rows change
+            if frame is self.source:
+                return self.days
+
+            self.source = frame
+            if generation != self.generation or self.days.empty:
+                self.days = summarize_days(frame)
+                self.generation = generation
+                self.stats["rebuilds"] += 1
+                self.stats["days_recomputed"] += len(self.days)
+                return self.days
+
+            last_day = self.days.index[-1]
+            dates = pd.to_datetime(frame['my_date'])
+            touched = summarize_days(frame[dates >= last_day])
+
+            days = self.days[self.days.index < last_day]
+            if window_start is not None:
+                days = days[days.index >= pd.Timestamp(window_start)]
+            self.days = pd.concat([days, touched])
+            self.stats["updates"] += 1
+            self.stats["days_recomputed"] += len(touched)
+            return self.days
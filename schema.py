@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+
+# In-memory schema shared by every loader of hourly rows:
+#   my_date        datetime64 (the only day type pandas works with natively)
+#   my_hour        int8
+#   sum_of_amount  int32/int64 when every amount is whole, else float64
+#   my_datetime    datetime64, my_date + my_hour
+# No per-row constant or label columns are kept; charts style traces directly
+# and Plotly formats labels in the browser.
+HOURLY_DTYPES = {"my_hour": "int8"}
+
+
+# The narrowest type that still holds every amount exactly
+def narrow_amounts(amounts):
+    amounts = pd.to_numeric(amounts).astype("float64")
+    if amounts.empty or amounts.isna().any() or not (amounts % 1 == 0).all():
+        return amounts
+    if amounts.min() >= -2**31 and amounts.max() < 2**31:
+        return amounts.astype("int32")
+    return amounts.astype("int64")
+
+
+# Normalise a frame of hourly rows as it's loaded: apply the schema above and
+# add my_datetime once, vectorised, for charts to use as a time axis
+def prepare_hourly(df):
+    df['my_date'] = pd.to_datetime(df['my_date'])
+    df = df.astype(HOURLY_DTYPES)
+    df['sum_of_amount'] = narrow_amounts(df['sum_of_amount'])
+    df['my_datetime'] = df['my_date'] + pd.to_timedelta(df['my_hour'], unit='h')
+    return df
+
+
+# my_datetime as hours since the epoch, the integer form of (my_date, my_hour)
+def epoch_hours(df):
+    return df['my_datetime'].to_numpy().astype('datetime64[h]').astype(np.int64)
+
+
+# A date, datetime or Timestamp as a numpy day
+def to_day(date):
+    return pd.Timestamp(date).to_datetime64().astype('datetime64[D]')
+
+
+def bytes_per_row(df):
+    return float(df.memory_usage(deep=True, index=False).sum()) / max(len(df), 1)
+
+
+# Bytes per row as the frame is held now vs. the old layout (int64 hours,
+# float64 amounts, a string hour label and a constant colour column)
+def memory_report(df):
+    legacy = df[['my_date', 'my_hour', 'sum_of_amount']].astype({'my_hour': 'int64', 'sum_of_amount': 'float64'})
+    legacy['Date and Hour of the Day'] = legacy['my_date'].dt.strftime('%Y-%m-%d') + ' ' + legacy['my_hour'].astype(str).str.zfill(2)
+    legacy['color'] = 'black'
+    return {
+        "rows": len(df),
+        "bytes_per_row_before": round(bytes_per_row(legacy), 1),
+        "bytes_per_row_after": round(bytes_per_row(df), 1),
+    }
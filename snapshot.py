@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # snapshots are optional
+    pa = None
+
+
+# Local columnar snapshots of fetched frames, written as Arrow IPC files and
+# opened memory-mapped. Each file carries a small JSON metadata blob (data
+# watermark, source file stats, ...) so callers can tell how fresh it is.
+class SnapshotStore:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.enabled = pa is not None
+        self._saved = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.arrow")
+
+    def save(self, name, frame, meta):
+        if not self.enabled:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b"airtel"] = json.dumps(meta, default=str).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        # Write next to the target and swap it in, so readers never see half a file
+        path = self.path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return True
+
+    # Save unless this exact frame object was the last one saved under `name`
+    def save_if_changed(self, name, frame, meta):
+        with self._lock:
+            if self._saved.get(name) is frame:
+                return False
+            saved = self.save(name, frame, meta)
+            if saved:
+                self._saved[name] = frame
+            return saved
+
+    # (frame, meta), or (None, None) when there is no usable snapshot
+    def load(self, name):
+        path = self.path(name)
+        if not self.enabled or not os.path.exists(path):
+            return None, None
+        try:
+            with pa.memory_map(path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+                frame = table.to_pandas()
+            meta = json.loads((table.schema.metadata or {}).get(b"airtel", b"{}"))
+        except (pa.ArrowInvalid, OSError, ValueError):
+            return None, None
+        return frame, meta
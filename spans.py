@@ -0,0 +1,117 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("airtel.spans")
+
+# Set AIRTEL_TRACE=1 to time each stage of a rerun; off, span() hands back a
+# shared do-nothing context manager and traced() returns the function as is
+ENABLED = os.environ.get("AIRTEL_TRACE", "") not in ("", "0")
+
+_local = threading.local()
+
+
+# The spans of one script run (a full rerun or a fragment rerun) of a session
+class Trace:
+
+    def __init__(self, session_id, rerun, kind):
+        self.session_id = session_id
+        self.rerun = rerun
+        self.kind = kind
+        self.started_at = time.perf_counter()
+        self.spans = []
+        self.stack = []
+
+    def records(self):
+        return [
+            {"session": self.session_id, "rerun": self.rerun, "kind": self.kind, **span}
+            for span in self.spans
+        ]
+
+
+class _Span:
+
+    __slots__ = ("trace", "name", "start", "record")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        trace = self.trace
+        self.record = {
+            "span": self.name,
+            "parent": trace.stack[-1]["span"] if trace.stack else None,
+            "depth": len(trace.stack),
+        }
+        trace.spans.append(self.record)
+        trace.stack.append(self.record)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.record["offset_ms"] = round(1000 * (self.start - self.trace.started_at), 3)
+        self.record["ms"] = round(1000 * (end - self.start), 3)
+        self.trace.stack.pop()
+        return False
+
+
+class _NoSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+# Start the trace of a script run on this thread (replacing any left over
+# from a run that returned early)
+def begin(session_id, rerun, kind="rerun"):
+    if not ENABLED:
+        return None
+    _local.trace = Trace(session_id, rerun, kind)
+    return _local.trace
+
+
+# Finish this thread's trace and log one JSON line per span
+def end():
+    trace = current()
+    if trace is None:
+        return None
+    _local.trace = None
+    for record in trace.records():
+        logger.info(json.dumps(record))
+    return trace
+
+
+def span(name):
+    trace = getattr(_local, "trace", None) if ENABLED else None
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+# Decorator: every call of the function is a span named `name`
+def traced(name):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,117 @@
+import builtins
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger("airtel.startup")
+
+# Set AIRTEL_IMPORT_PROFILE=1 to time every module imported during startup
+PROFILE_IMPORTS = os.environ.get("AIRTEL_IMPORT_PROFILE", "") not in ("", "0")
+
+# Cold start budget in seconds (import + first render); 0 disables the check
+COLD_START_BUDGET = float(os.environ.get("AIRTEL_COLD_START_BUDGET", 0))
+
+# Where the "airtel.*" loggers (metrics, spans, figure payloads) write: stderr
+# unless AIRTEL_LOG_FILE is set, at AIRTEL_LOG_LEVEL (INFO by default)
+LOG_FILE = os.environ.get("AIRTEL_LOG_FILE", "")
+LOG_LEVEL = os.environ.get("AIRTEL_LOG_LEVEL", "INFO").upper()
+
+_started_at = None
+_cold_start = None
+_import_times = {}
+_local = threading.local()
+_original_import = builtins.__import__
+
+
+# Times imports of modules that aren't loaded yet. Each entry keeps the
+# inclusive time and the time spent in the module itself (minus nested imports).
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        if name not in _import_times:
+            _import_times[name] = {"inclusive": elapsed, "self": elapsed - nested}
+
+
+# Give the "airtel" logger a handler of its own, once per process. The
+# records are JSON lines, so only the message is written.
+def configure_logging():
+    root = logging.getLogger("airtel")
+    if root.handlers:
+        return
+    handler = logging.FileHandler(LOG_FILE) if LOG_FILE else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+
+# Call as early as possible: starts the cold start clock and, when profiling,
+# hooks the import machinery
+def begin():
+    global _started_at
+    if _started_at is not None:
+        return
+    _started_at = time.perf_counter()
+    configure_logging()
+    if PROFILE_IMPORTS:
+        builtins.__import__ = _timed_import
+
+
+# Call once the first page has rendered: stops the clock, logs the cold start
+# metric and the import report, and unhooks the import machinery
+def mark_ready():
+    global _cold_start
+    if _cold_start is not None or _started_at is None:
+        return
+    _cold_start = time.perf_counter() - _started_at
+    builtins.__import__ = _original_import
+
+    record = {"metric": "cold_start_seconds", "value": round(_cold_start, 3), "budget": COLD_START_BUDGET or None}
+    if COLD_START_BUDGET and _cold_start > COLD_START_BUDGET:
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+
+    if PROFILE_IMPORTS:
+        for name, cost in import_report(limit=25):
+            logger.info(json.dumps({"metric": "import_seconds", "module": name, **cost}))
+
+
+def cold_start_seconds():
+    return _cold_start
+
+
+# Slowest imports first, by inclusive time
+def import_report(limit=None):
+    report = sorted(_import_times.items(), key=lambda item: item[1]["inclusive"], reverse=True)
+    return [(name, {k: round(v, 4) for k, v in cost.items()}) for name, cost in report[:limit]]
+
+
+# A module that is only really imported when one of its attributes is first
+# used, for heavy dependencies of features that may never be opened
+def lazy_module(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
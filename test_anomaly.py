@@ -0,0 +1,33 @@
+from datetime import date
+
+import numpy as np
+
+from anomaly import AnomalyDetector
+from benchmark import synthetic_hours
+
+
+# backfill() runs the same recurrence as update(), a day at a time: the
+# z-scores, flags and baselines must match hour for hour, gaps included
+def test_backfill_matches_update_hour_for_hour():
+    start = date(2024, 1, 1)
+    _, _, amounts = synthetic_hours(start, 24 * 120, seed=3)
+    amounts[::37] *= 3
+    amounts[500:530] = np.nan
+    first_hour = int(np.datetime64(start, "h").astype(np.int64)) + 5
+    amounts = amounts[5:]
+
+    stepped = AnomalyDetector(threshold=2.5)
+    stepped_z = []
+    for offset, amount in enumerate(amounts):
+        stepped_z.append(np.nan if np.isnan(amount) else stepped.update(first_hour + offset, amount))
+
+    batched = AnomalyDetector(threshold=2.5)
+    batched_z = batched.backfill(first_hour, amounts)
+
+    np.testing.assert_allclose(batched_z.to_numpy(), np.array(stepped_z, dtype=np.float64), equal_nan=True)
+    assert stepped.flags
+    assert [flag[0] for flag in batched.flags] == [flag[0] for flag in stepped.flags]
+    np.testing.assert_allclose(np.array(batched.flags)[:, 1:], np.array(stepped.flags)[:, 1:])
+    np.testing.assert_allclose(batched.mean, stepped.mean)
+    np.testing.assert_allclose(batched.var, stepped.var)
+    assert batched.last_hour == stepped.last_hour
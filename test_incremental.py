@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmark import sqlite_standin
+from incremental import IncrementalLoader
+from queries import USAGE_TABLE
+from schema import prepare_hourly
+
+
+def new_loader():
+    return IncrementalLoader(USAGE_TABLE, window_days=35, placeholder="?", prepare=prepare_hourly)
+
+
+# The loader's rows must be exactly what a fresh full read of the window gives
+def assert_matches_fresh_read(conn, loader):
+    fresh = new_loader()
+    fresh.refresh(conn)
+    pd.testing.assert_frame_equal(loader.frame, fresh.frame)
+    assert loader.window_start == fresh.window_start
+
+
+def last_hour(conn):
+    my_date, my_hour = conn.execute(
+        f"SELECT my_date, my_hour FROM {USAGE_TABLE} ORDER BY my_date DESC, my_hour DESC LIMIT 1"
+    ).fetchone()
+    return date.fromisoformat(my_date) if isinstance(my_date, str) else my_date, my_hour
+
+
+# Append `hours` hours after the last one
+def append_hours(conn, hours, amount=12345.0):
+    my_date, my_hour = last_hour(conn)
+    for _ in range(hours):
+        my_hour += 1
+        if my_hour == 24:
+            my_date, my_hour = my_date + timedelta(days=1), 0
+        conn.execute(f"INSERT INTO {USAGE_TABLE} VALUES (?, ?, ?)", (my_date.isoformat(), my_hour, amount))
+    conn.commit()
+
+
+def test_new_hours_are_fetched_as_a_delta():
+    conn, _ = sqlite_standin(2)
+    loader = new_loader()
+    loader.refresh(conn)
+
+    # The last hour keeps accumulating, then more hours land
+    my_date, my_hour = last_hour(conn)
+    conn.execute(
+        f"UPDATE {USAGE_TABLE} SET sum_of_amount = sum_of_amount + 500 WHERE my_date = ? AND my_hour = ?",
+        (my_date.isoformat(), my_hour),
+    )
+    append_hours(conn, 3)
+    loader.refresh(conn)
+
+    assert loader.stats["full_loads"] == 1
+    assert loader.stats["delta_loads"] == 1
+    assert_matches_fresh_read(conn, loader)
+
+
+def test_rows_sliding_out_of_the_window_are_trimmed():
+    conn, _ = sqlite_standin(2)
+    loader = new_loader()
+    loader.refresh(conn)
+    generation, window_start = loader.generation, loader.window_start
+
+    append_hours(conn, 30)
+    loader.refresh(conn)
+
+    assert loader.generation == generation
+    assert loader.window_start > window_start
+    assert_matches_fresh_read(conn, loader)
+
+
+def test_rows_rewritten_behind_the_watermark_reload_the_window():
+    conn, _ = sqlite_standin(2)
+    loader = new_loader()
+    loader.refresh(conn)
+
+    my_date, _ = last_hour(conn)
+    conn.execute(f"UPDATE {USAGE_TABLE} SET sum_of_amount = sum_of_amount + 7 WHERE my_date = ?", (my_date.isoformat(),))
+    conn.commit()
+    loader.refresh(conn)
+
+    assert loader.stats["full_loads"] == 2
+    assert_matches_fresh_read(conn, loader)
+
+
+def test_back_filled_rows_reload_the_window():
+    conn, _ = sqlite_standin(2)
+    my_date, _ = last_hour(conn)
+    gap = (my_date - timedelta(days=3)).isoformat()
+    missing = conn.execute(f"SELECT * FROM {USAGE_TABLE} WHERE my_date = ? AND my_hour = 10", (gap,)).fetchone()
+    conn.execute(f"DELETE FROM {USAGE_TABLE} WHERE my_date = ? AND my_hour = 10", (gap,))
+    conn.commit()
+
+    loader = new_loader()
+    loader.refresh(conn)
+    conn.execute(f"INSERT INTO {USAGE_TABLE} VALUES (?, ?, ?)", (gap, 10, missing[2]))
+    append_hours(conn, 1)
+    loader.refresh(conn)
+
+    assert loader.stats["full_loads"] == 2
+    assert_matches_fresh_read(conn, loader)
+
+
+def test_restored_loader_catches_up_with_a_delta():
+    conn, _ = sqlite_standin(2)
+    loader = new_loader()
+    loader.refresh(conn)
+
+    restored = new_loader()
+    assert restored.restore(loader.frame.copy(), loader.snapshot_meta())
+    append_hours(conn, 5)
+    restored.refresh(conn)
+
+    assert restored.stats["full_loads"] == 0
+    assert restored.stats["delta_loads"] == 1
+    assert_matches_fresh_read(conn, restored)
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmark import sqlite_standin
+from incremental import IncrementalLoader
+from kpis import SlidingKPIs, kpis_from_rows
+from queries import USAGE_TABLE, TableQueries, read_all
+from schema import prepare_hourly
+
+
+# The KPIs aggregated in SQL against the sliding window over the same rows
+def sql_and_sliding_kpis(conn, days=30):
+    loader = IncrementalLoader(USAGE_TABLE, placeholder="?", prepare=prepare_hourly)
+    loader.refresh(conn)
+    start = loader.frame["my_date"].iat[-1] - pd.Timedelta(days=days - 1)
+
+    sliding = SlidingKPIs()
+    sliding.sync(loader)
+    query = TableQueries(USAGE_TABLE, placeholder="?").kpi_summary(start.date().isoformat())
+    return kpis_from_rows(read_all(conn, query)), sliding.kpis(start)
+
+
+def test_sql_kpis_match_sliding_kpis():
+    conn, _ = sqlite_standin(3)
+    sql, sliding = sql_and_sliding_kpis(conn)
+    assert sql == sliding
+
+
+# Ties go to the earliest day and hour on both sides
+def test_sql_kpis_break_ties_like_sliding_kpis():
+    conn, _ = sqlite_standin(3)
+    (last_day,) = conn.execute(f"SELECT MAX(my_date) FROM {USAGE_TABLE}").fetchone()
+    tied_days = [(date.fromisoformat(last_day) - timedelta(days=n)).isoformat() for n in (20, 10, 5)]
+    for my_date in tied_days:
+        conn.execute(f"UPDATE {USAGE_TABLE} SET sum_of_amount = 1000000 WHERE my_date = ? AND my_hour IN (3, 9)", (my_date,))
+        conn.execute(f"UPDATE {USAGE_TABLE} SET sum_of_amount = 1 WHERE my_date = ? AND my_hour IN (4, 8)", (my_date,))
+    conn.commit()
+
+    sql, sliding = sql_and_sliding_kpis(conn)
+    assert sql == sliding
+    assert sql["highest_hour"][:2] == (pd.Timestamp(tied_days[0]), 3)
+    assert sql["lowest_hour"][:2] == (pd.Timestamp(tied_days[0]), 4)